@@ -0,0 +1,292 @@
+"""Нагрузочный прогон yatube по HTTP со смесью реального трафика.
+
+В отличие от run.py ходит в живой сервер (runserver или WSGI-сервер
+с yatube.wsgi), поэтому видит блокировку записи SQLite, очередь
+миниатюр и настоящий стек middleware. Каждый виртуальный пользователь —
+поток со своей сессией requests; зарегистрированные входят на сайт
+под пользователями seed_data.
+
+    python yatube/manage.py seed_data
+    python yatube/manage.py runserver --noreload &
+    python benchmarks/load.py --users 20 --duration 60 \\
+        --mix index=40,group=15,profile=15,follow=20,comment=7,create=3
+
+Цели (авторы, группы, посты) берутся из той же базы, что у сервера.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from posts.management.commands.seed_data import PASSWORD  # noqa: E402
+from posts.models import Group, Post, User  # noqa: E402
+
+DEFAULT_MIX = 'index=40,group=15,profile=15,follow=20,comment=7,create=3'
+# Границы корзин гистограммы, мс
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Targets:
+    """Что читать и куда писать: выборка из засеянной базы."""
+
+    def __init__(self, size):
+        self.users = list(User.objects.filter(
+            posts__isnull=False
+        ).distinct().order_by('pk').values_list('username', flat=True)[:size])
+        self.authors = list(User.objects.order_by(
+            '-counters__followers_count', 'pk'
+        ).values_list('username', flat=True)[:size])
+        self.groups = list(Group.objects.values_list('pk', 'slug'))
+        self.posts = list(Post.objects.order_by('-created').values_list(
+            'pk', flat=True)[:size])
+        if not (self.users and self.posts):
+            raise SystemExit('База пуста: сначала выполните seed_data')
+
+
+def jpeg(rng):
+    buffer = io.BytesIO()
+    color = tuple(rng.randrange(256) for _ in range(3))
+    Image.new('RGB', (960, 640), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class VirtualUser:
+    """Поток со своей сессией, выполняющий сценарии из смеси."""
+
+    def __init__(self, number, options, targets):
+        self.base = options.url.rstrip('/')
+        self.targets = targets
+        self.rng = random.Random(options.seed + number)
+        # Анонимные сценарии ходят без cookie сессии
+        self.anonymous = requests.Session()
+        self.session = requests.Session()
+        self.username = targets.users[number % len(targets.users)]
+        self.password = options.password
+        self.think = options.think
+        self.samples = []
+
+    def url(self, path):
+        return self.base + path
+
+    def csrf(self):
+        return {'X-CSRFToken': self.session.cookies.get('csrftoken', '')}
+
+    def login(self):
+        self.session.get(self.url('/auth/login/'))
+        response = self.session.post(
+            self.url('/auth/login/'),
+            data={'username': self.username, 'password': self.password},
+            headers=self.csrf(),
+            allow_redirects=False,
+        )
+        if response.status_code != 302:
+            raise SystemExit(f'Не удалось войти под {self.username}')
+
+    def index(self):
+        page = self.rng.choice(('', '', '', '?page=2'))
+        return self.anonymous.get(self.url(f'/{page}'))
+
+    def group(self):
+        _, slug = self.rng.choice(self.targets.groups)
+        return self.anonymous.get(self.url(f'/group/{slug}/'))
+
+    def profile(self):
+        username = self.rng.choice(self.targets.authors)
+        return self.session.get(self.url(f'/profile/{username}/'))
+
+    def follow(self):
+        return self.session.get(self.url('/follow/'))
+
+    def comment(self):
+        post_id = self.rng.choice(self.targets.posts)
+        return self.session.post(
+            self.url(f'/posts/{post_id}/comment/'),
+            data={'text': f'Нагрузочный комментарий {self.rng.random()}'},
+            headers=self.csrf(),
+            allow_redirects=False,
+        )
+
+    def create(self):
+        data = {'text': f'Нагрузочный пост {self.rng.random()}'}
+        if self.targets.groups and self.rng.random() < 0.5:
+            data['group'], _ = self.rng.choice(self.targets.groups)
+        return self.session.post(
+            self.url('/create/'),
+            data=data,
+            files={'image': ('load.jpg', jpeg(self.rng), 'image/jpeg')},
+            headers=self.csrf(),
+            allow_redirects=False,
+        )
+
+    def run(self, scenarios, weights, deadline):
+        while time.monotonic() < deadline:
+            name = self.rng.choices(scenarios, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = SCENARIOS[name](self).status_code
+            except requests.RequestException:
+                status = None
+            elapsed = time.perf_counter() - start
+            self.samples.append((name, status, elapsed))
+            if self.think:
+                time.sleep(self.rng.expovariate(1 / self.think))
+        return self.samples
+
+
+# Сценарии смеси --mix: имя -> метод VirtualUser
+SCENARIOS = {
+    'index': VirtualUser.index,
+    'group': VirtualUser.group,
+    'profile': VirtualUser.profile,
+    'follow': VirtualUser.follow,
+    'comment': VirtualUser.comment,
+    'create': VirtualUser.create,
+}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = (item.strip() for item in part.partition('='))
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(
+                f'Неизвестный сценарий: {part} '
+                f'(есть {", ".join(SCENARIOS)})'
+            )
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'Нет веса сценария: {part}')
+        if mix[name] < 0:
+            raise argparse.ArgumentTypeError(f'Отрицательный вес: {part}')
+    return mix
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def histogram(latencies):
+    """Число запросов по корзинам BUCKETS (последняя — всё, что дольше)."""
+    counts = Counter()
+    for latency in latencies:
+        for bound in BUCKETS:
+            if latency <= bound:
+                counts[f'<={bound}ms'] += 1
+                break
+        else:
+            counts[f'>{BUCKETS[-1]}ms'] += 1
+    labels = [f'<={bound}ms' for bound in BUCKETS] + [f'>{BUCKETS[-1]}ms']
+    return {label: counts[label] for label in labels}
+
+
+def summarize(samples, elapsed):
+    by_scenario = defaultdict(list)
+    for name, status, seconds in samples:
+        by_scenario[name].append((status, seconds * 1000))
+    report = {}
+    for name, rows in sorted(by_scenario.items()):
+        latencies = [ms for _, ms in rows]
+        report[name] = {
+            'requests': len(rows),
+            'errors': sum(
+                1 for status, _ in rows if status is None or status >= 400
+            ),
+            'rps': round(len(rows) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50), 1),
+            'p95_ms': round(percentile(latencies, 0.95), 1),
+            'p99_ms': round(percentile(latencies, 0.99), 1),
+            'max_ms': round(max(latencies), 1),
+            'histogram': histogram(latencies),
+        }
+    return report
+
+
+def print_report(report, elapsed, total):
+    print(f'{total} запросов за {elapsed:.1f} с: {total / elapsed:.1f} RPS')
+    for name, stats in report.items():
+        print(
+            f'\n{name}: {stats["requests"]} запросов, '
+            f'{stats["errors"]} ошибок, {stats["rps"]} RPS, '
+            f'p50={stats["p50_ms"]}ms p95={stats["p95_ms"]}ms '
+            f'p99={stats["p99_ms"]}ms max={stats["max_ms"]}ms'
+        )
+        widest = max(stats['histogram'].values()) or 1
+        for label, count in stats['histogram'].items():
+            if count:
+                bar = '#' * max(1, round(40 * count / widest))
+                print(f'  {label:>9} {count:>7} {bar}')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument(
+        '--users', type=int, default=10, help='Виртуальных пользователей',
+    )
+    parser.add_argument('--duration', type=float, default=30, help='Секунд')
+    parser.add_argument(
+        '--think', type=float, default=0.0,
+        help='Средняя пауза между запросами пользователя, секунд',
+    )
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument('--password', default=PASSWORD)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Записать отчёт в JSON')
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    mix = options.mix
+    targets = Targets(max(options.users, 50))
+    users = [
+        VirtualUser(number, options, targets)
+        for number in range(options.users)
+    ]
+    for user in users:
+        user.login()
+    scenarios, weights = list(mix), list(mix.values())
+    start = time.monotonic()
+    deadline = start + options.duration
+    with ThreadPoolExecutor(max_workers=options.users) as pool:
+        results = pool.map(
+            lambda user: user.run(scenarios, weights, deadline), users
+        )
+        samples = [sample for result in results for sample in result]
+    elapsed = time.monotonic() - start
+    report = summarize(samples, elapsed)
+    print_report(report, elapsed, len(samples))
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump({
+                'url': options.url,
+                'users': options.users,
+                'duration': round(elapsed, 1),
+                'mix': mix,
+                'scenarios': report,
+            }, output, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""Бенчмарк представлений yatube через тестовый клиент Django.
+
+Создаёт временную базу, заполняет её командой seed_data и прогоняет
+каждый именованный URL из posts.urls, posts.api_urls, users.urls и
+about.urls. Для каждого представления записывает p50/p95/p99 времени
+ответа, число SQL-запросов, число прочитанных строк и размер ответа
+в JSON.
+
+    python benchmarks/run.py --output before.json
+    python benchmarks/run.py --output after.json --baseline before.json
+
+С --baseline печатается сравнение, а при регрессии отслеживаемых
+представлений (--watch) скрипт завершается с кодом 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.tokens import default_token_generator  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import get_resolver, reverse  # noqa: E402
+from django.utils.encoding import force_bytes  # noqa: E402
+from django.utils.http import urlsafe_base64_encode  # noqa: E402
+
+from core.middleware import count_queries  # noqa: E402
+from posts.models import Follow, Group, Post, User  # noqa: E402
+
+NAMESPACES = ('posts', 'api', 'users', 'about')
+# Представления, регрессии которых роняют сравнение по умолчанию
+WATCHED = (
+    'posts:main_page', 'posts:profile', 'posts:post_detail',
+    'posts:follow_index',
+)
+# Страницы, которые смотрят без входа на сайт
+ANONYMOUS = {
+    'users:login', 'users:signup', 'users:reset_password',
+    'users:password_reset_done', 'users:password_reset_confirm',
+    'users:password_reset_complete',
+}
+
+
+class CountingCursor:
+    """Обёртка DB-API курсора, считающая выбранные строки."""
+
+    def __init__(self, cursor, counter):
+        self.cursor = cursor
+        self.counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.counter.rows += 1
+            yield row
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.counter.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self.counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.counter.rows += len(rows)
+        return rows
+
+
+class RowCounter:
+    """execute_wrapper, подменяющий курсор на CountingCursor."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        wrapper = context['cursor']
+        if isinstance(wrapper.cursor, CountingCursor):
+            wrapper.cursor.counter = self
+        else:
+            wrapper.cursor = CountingCursor(wrapper.cursor, self)
+        return execute(sql, params, many, context)
+
+
+def percentile(values, fraction):
+    """Перцентиль с линейной интерполяцией между соседними значениями."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def measure(client, url, data=None):
+    stack, queries = count_queries()
+    rows = RowCounter()
+    for db in connections.all():
+        stack.enter_context(db.execute_wrapper(rows))
+    with stack:
+        start = time.perf_counter()
+        response = client.get(url, data or {})
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'status': response.status_code,
+        'queries': queries.count,
+        'rows': rows.rows,
+        'bytes': size,
+    }
+
+
+class Fixtures:
+    """Объекты засеянной базы, подставляемые в аргументы URL."""
+
+    def __init__(self):
+        self.reader = User.objects.filter(posts__isnull=False).order_by(
+            '-counters__following_count', 'pk'
+        ).first()
+        self.author = User.objects.exclude(pk=self.reader.pk).order_by(
+            '-counters__followers_count', 'pk'
+        ).first()
+        self.post = Post.objects.order_by('-comments_count', 'pk').first()
+        self.own_post = self.reader.posts.order_by('-created').first()
+        self.group = Group.objects.order_by('-posts_count', 'pk').first()
+        self.query = self.post.text.split()[0]
+
+    def kwargs(self, name):
+        if name == 'posts:post_edit':
+            return {'post_id': self.own_post.pk}
+        if name == 'users:password_reset_confirm':
+            return {
+                'uidb64': urlsafe_base64_encode(force_bytes(self.reader.pk)),
+                'token': default_token_generator.make_token(self.reader),
+            }
+        return {
+            'slug': self.group.slug,
+            'username': self.author.username,
+            'post_id': self.post.pk,
+        }
+
+    def data(self, name):
+        if name in ('posts:search', 'posts:search_api'):
+            return {'q': self.query}
+        return None
+
+    def prepare(self, name, client):
+        """Возвращает страницу в исходное состояние перед замером."""
+        if name == 'users:logout':
+            client.force_login(self.reader)
+        elif name == 'posts:profile_follow':
+            Follow.objects.filter(
+                user=self.reader, author=self.author
+            ).delete()
+        elif name == 'posts:profile_unfollow':
+            Follow.objects.get_or_create(
+                user=self.reader, author=self.author
+            )
+
+
+def url_patterns():
+    """Именованные URL приложений и имена их аргументов."""
+    resolver = get_resolver()
+    for namespace in NAMESPACES:
+        patterns = resolver.namespace_dict[namespace][1].url_patterns
+        for pattern in patterns:
+            if pattern.name:
+                yield (
+                    f'{namespace}:{pattern.name}',
+                    set(pattern.pattern.converters),
+                )
+
+
+def run_view(name, arguments, fixtures, options):
+    client = Client()
+    if name not in ANONYMOUS:
+        client.force_login(fixtures.reader)
+    url = reverse(name, kwargs={
+        key: value for key, value in fixtures.kwargs(name).items()
+        if key in arguments
+    })
+    data = fixtures.data(name)
+    samples = []
+    for step in range(options.warmup + options.iterations):
+        fixtures.prepare(name, client)
+        if options.cold:
+            cache.clear()
+        sample = measure(client, url, data)
+        if step >= options.warmup:
+            samples.append(sample)
+    timings = [sample['seconds'] * 1000 for sample in samples]
+    return {
+        'url': url,
+        'status': samples[-1]['status'],
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'queries': max(sample['queries'] for sample in samples),
+        'rows': max(sample['rows'] for sample in samples),
+        'bytes': max(sample['bytes'] for sample in samples),
+    }
+
+
+def compare(results, baseline, watch, threshold):
+    """Печатает разницу с прошлым прогоном, возвращает список регрессий."""
+    regressions = []
+    print(f'{"view":32} {"p95 ms":>18} {"queries":>10} {"rows":>12}')
+    for name, current in sorted(results['views'].items()):
+        before = baseline['views'].get(name)
+        if before is None:
+            continue
+        print(
+            f'{name:32} {before["p95_ms"]:>8.2f} → {current["p95_ms"]:<8.2f}'
+            f'{before["queries"]:>4} → {current["queries"]:<4}'
+            f'{before["rows"]:>5} → {current["rows"]:<5}'
+        )
+        if name not in watch:
+            continue
+        if current['queries'] > before['queries']:
+            regressions.append(f'{name}: SQL-запросов стало больше')
+        if current['rows'] > before['rows'] * (1 + threshold):
+            regressions.append(f'{name}: строк прочитано больше')
+        if current['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f'{name}: p95 вырос больше чем на '
+                               f'{threshold:.0%}')
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', help='JSON прошлого прогона')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument(
+        '--cold', action='store_true',
+        help='Очищать кэш перед каждым запросом',
+    )
+    parser.add_argument(
+        '--view', action='append', dest='views',
+        help='Замерить только это представление (можно повторять)',
+    )
+    parser.add_argument(
+        '--watch', action='append',
+        help='Представления, регрессия которых — ошибка',
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='Допустимый рост p95 и строк, доля',
+    )
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=10000)
+    parser.add_argument('--follows', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    setup_test_environment(debug=False)
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    connection.creation.create_test_db(verbosity=0)
+    cache.clear()
+    call_command(
+        'seed_data', users=options.users, groups=options.groups,
+        posts=options.posts, comments=options.comments,
+        follows=options.follows, seed=options.seed, verbosity=0,
+        stdout=open(os.devnull, 'w'),
+    )
+    fixtures = Fixtures()
+    results = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': options.iterations,
+            'warmup': options.warmup,
+            'cold_cache': options.cold,
+            'dataset': {
+                key: getattr(options, key) for key in
+                ('users', 'groups', 'posts', 'comments', 'follows', 'seed')
+            },
+        },
+        'views': {},
+    }
+    for name, arguments in url_patterns():
+        if options.views and name not in options.views:
+            continue
+        results['views'][name] = stats = run_view(
+            name, arguments, fixtures, options
+        )
+        print(
+            f'{name:32} {stats["status"]} p50={stats["p50_ms"]:.2f}ms '
+            f'p95={stats["p95_ms"]:.2f}ms p99={stats["p99_ms"]:.2f}ms '
+            f'q={stats["queries"]} rows={stats["rows"]} '
+            f'{stats["bytes"]}B'
+        )
+    with open(options.output, 'w') as output:
+        json.dump(results, output, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+    if options.baseline:
+        with open(options.baseline) as source:
+            baseline = json.load(source)
+        regressions = compare(
+            results, baseline, options.watch or WATCHED, options.threshold
+        )
+        for message in regressions:
+            print(f'РЕГРЕССИЯ {message}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Пропускная способность SQLite в профилях 'default' и 'production'.
+
+Засевает временную базу один раз и для каждого профиля из
+settings.SQLITE_PROFILES прогоняет на её копии одну и ту же смесь:
+читатели запрашивают API (он не кэшируется и всегда идёт в базу),
+писатели оставляют комментарии и создают посты. Все — потоки
+одного процесса, как в многопоточном WSGI-сервере; после каждого
+запроса соединения закрываются по CONN_MAX_AGE, как в конце запроса.
+
+    python benchmarks/sqlite.py --readers 8 --writers 4 --duration 10
+
+Печатает чтения и записи в секунду, p95, число ошибок
+"database is locked" (и ответов 503 от core.writes), повторы записи и
+суммарное ожидание блокировки для каждого профиля.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import (  # noqa: E402
+    OperationalError, close_old_connections, connections,
+)
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from core import writes  # noqa: E402
+from posts.models import Post, User  # noqa: E402
+
+PROFILES = ('default', 'production')
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def use_database(path, profile):
+    """Переключает alias default на файл path с настройками профиля."""
+    connections.close_all()
+    connections.databases['default'].update(
+        NAME=path, **settings.SQLITE_PROFILES[profile]
+    )
+
+
+def prepare(directory, options):
+    path = os.path.join(directory, 'seed.sqlite3')
+    use_database(path, 'default')
+    call_command('migrate', verbosity=0)
+    call_command(
+        'seed_data', users=options.users, posts=options.posts,
+        comments=options.posts, follows=5, seed=options.seed,
+        verbosity=0, stdout=open(os.devnull, 'w'),
+    )
+    connections.close_all()
+    return path
+
+
+class Worker(threading.Thread):
+    def __init__(self, kind, user, urls, posts, deadline, stats):
+        super().__init__()
+        self.kind = kind
+        self.user = user
+        self.urls = urls
+        self.posts = posts
+        self.deadline = deadline
+        self.stats = stats
+
+    def request(self, client, step):
+        if self.kind == 'read':
+            return client.get(self.urls[step % len(self.urls)])
+        if step % 2:
+            return client.post(reverse('posts:post_create'), {
+                'text': f'Пост {self.name} {step}',
+            })
+        post_id = self.posts[step % len(self.posts)]
+        return client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post_id}),
+            {'text': f'Комментарий {self.name} {step}'},
+        )
+
+    def run(self):
+        client = Client()
+        # Вход пишет сессию: без очереди записи падает на общем старте
+        writes.run_serialized(client.force_login, self.user)
+        close_old_connections()
+        timings, locked, step = [], 0, 0
+        while time.monotonic() < self.deadline:
+            started = time.perf_counter()
+            try:
+                response = self.request(client, step)
+                if response.status_code == 503:
+                    locked += 1
+                else:
+                    timings.append((time.perf_counter() - started) * 1000)
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                locked += 1
+            finally:
+                # Как обработчик WSGI в конце запроса
+                close_old_connections()
+            step += 1
+        connections.close_all()
+        self.stats[self.kind].append((timings, locked))
+
+
+def run_profile(profile, seed_path, directory, options):
+    path = os.path.join(directory, f'{profile}.sqlite3')
+    shutil.copy(seed_path, path)
+    use_database(path, profile)
+    cache.clear()
+    users = list(User.objects.filter(posts__isnull=False).order_by('pk')[
+        :options.readers + options.writers
+    ])
+    posts = list(Post.objects.order_by('-created').values_list(
+        'pk', flat=True)[:50])
+    urls = [reverse('api:post_list')] + [
+        reverse('api:post_detail', kwargs={'post_id': post_id})
+        for post_id in posts[:10]
+    ] + [
+        reverse('api:profile_posts', kwargs={'username': user.username})
+        for user in users[:10]
+    ]
+    connections.close_all()
+    before = writes.stats.snapshot()
+    stats = defaultdict(list)
+    deadline = time.monotonic() + options.duration
+    workers = [
+        Worker('read', users[number % len(users)], urls, posts,
+               deadline, stats)
+        for number in range(options.readers)
+    ] + [
+        Worker('write', users[-1 - number % len(users)], urls, posts,
+               deadline, stats)
+        for number in range(options.writers)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    result = {}
+    for kind in ('read', 'write'):
+        timings = [value for values, _ in stats[kind] for value in values]
+        result[kind] = {
+            'per_second': round(len(timings) / options.duration, 1),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'locked': sum(locked for _, locked in stats[kind]),
+        }
+    after = writes.stats.snapshot()
+    result['lock'] = {
+        key: round(after[key] - before[key], 1)
+        for key in ('transactions', 'retries', 'failures', 'lock_wait_ms')
+    }
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Сохранить результат в JSON')
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    settings.DEBUG = False
+    settings.QUERY_BUDGET_ACTION = None
+    directory = tempfile.mkdtemp()
+    settings.MEDIA_ROOT = directory
+    try:
+        seed_path = prepare(directory, options)
+        results = {}
+        for profile in PROFILES:
+            results[profile] = stats = run_profile(
+                profile, seed_path, directory, options
+            )
+            print(
+                f'{profile:12} '
+                f'чтение {stats["read"]["per_second"]:8.1f}/с '
+                f'p95={stats["read"]["p95_ms"]:.1f}мс  '
+                f'запись {stats["write"]["per_second"]:7.1f}/с '
+                f'p95={stats["write"]["p95_ms"]:.1f}мс '
+                f'locked={stats["write"]["locked"]} '
+                f'повторов={stats["lock"]["retries"]} '
+                f'ожидание={stats["lock"]["lock_wait_ms"]:.0f}мс'
+            )
+    finally:
+        connections.close_all()
+        shutil.rmtree(directory)
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+from io import BytesIO
+
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post
+from tests.utils import assert_query_budget
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def many_posts(mixer, user, another_user, group):
+    posts = mixer.cycle(15).blend(
+        Post, author=user, group=group, image=''
+    )
+    mixer.cycle(15).blend(Comment, post=posts[0], author=another_user)
+    return posts
+
+
+@pytest.fixture
+def posts_with_images(mock_media, user, group):
+    """Посты с настоящими картинками и готовыми миниатюрами."""
+    posts = []
+    for number in range(3):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 48), 'red').save(buffer, 'PNG')
+        posts.append(Post.objects.create(
+            author=user, group=group, text=f'Картинка {number}',
+            image=SimpleUploadedFile(f'image{number}.png', buffer.getvalue()),
+        ))
+    names = [post.image.name for post in posts]
+    for name in names:
+        assert thumbnails.render_image(name) == (name, True)
+    thumbnails.mark_ready(names)
+    return posts
+
+
+class TestQueryBudget:
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+
+    def test_read_views(self, client, user_client, user, group, many_posts):
+        post = many_posts[0]
+        urls = [
+            '/',
+            f'/group/{group.slug}/',
+            f'/profile/{user.username}/',
+            f'/posts/{post.id}/',
+            f'/posts/{post.id}/comments/',
+            '/follow/',
+            '/create/',
+            f'/posts/{post.id}/edit/',
+        ]
+        for url in urls:
+            assert_query_budget(user_client, url)
+        for url in urls[:5]:
+            assert_query_budget(client, url)
+        api_urls = [
+            '/api/v1/posts/',
+            f'/api/v1/posts/{post.id}/',
+            f'/api/v1/posts/{post.id}/comments/',
+            f'/api/v1/groups/{group.slug}/posts/',
+            f'/api/v1/profiles/{user.username}/posts/',
+        ]
+        for url in api_urls:
+            assert_query_budget(user_client, url)
+            assert_query_budget(client, url)
+        assert_query_budget(user_client, '/api/v1/follow/')
+
+    def test_write_views(self, user_client, user, another_user, many_posts):
+        post = many_posts[0]
+        assert_query_budget(user_client, '/create/', 'post', {'text': 'Пост'})
+        assert_query_budget(
+            user_client, f'/posts/{post.id}/edit/', 'post', {'text': 'Правка'}
+        )
+        assert_query_budget(
+            user_client, f'/posts/{post.id}/comment/', 'post', {'text': 'Ок'}
+        )
+        assert_query_budget(
+            user_client, f'/profile/{another_user.username}/follow/'
+        )
+        assert Follow.objects.filter(user=user, author=another_user).exists()
+        assert_query_budget(
+            user_client, f'/profile/{another_user.username}/unfollow/'
+        )
+
+    def test_read_views_with_thumbnails(
+            self, client, user_client, user, group, posts_with_images):
+        post = posts_with_images[0]
+        urls = [
+            '/',
+            f'/group/{group.slug}/',
+            f'/profile/{user.username}/',
+            f'/posts/{post.id}/',
+        ]
+        for url in urls:
+            cache.clear()
+            response = assert_query_budget(user_client, url)
+            assert '/media/cache/' in response.content.decode(), (
+                'Страница должна показывать готовые миниатюры'
+            )
+            assert_query_budget(client, url)
+
+    @pytest.mark.parametrize('engine', ['query', 'merge', 'fanout'])
+    def test_writes_with_group_and_image(
+            self, settings, engine, mock_media, user_client, user,
+            another_user, group, many_posts):
+        settings.FOLLOW_FEED_ENGINE = engine
+        Follow.objects.create(user=another_user, author=user)
+        other = Group.objects.create(title='Другая', slug='other')
+        assert_query_budget(
+            user_client, '/create/', 'post',
+            {'text': 'Пост в группе', 'group': group.pk},
+        )
+        post = many_posts[0]
+        buffer = BytesIO()
+        Image.new('RGB', (64, 48), 'red').save(buffer, 'PNG')
+        assert_query_budget(
+            user_client, f'/posts/{post.id}/edit/', 'post', {
+                'text': 'Правка', 'group': other.pk,
+                'image': SimpleUploadedFile('edit.png', buffer.getvalue()),
+            },
+        )
+        post = Post.objects.get(pk=post.pk)
+        assert post.group == other and post.image
+        assert_query_budget(
+            user_client, f'/profile/{another_user.username}/follow/'
+        )
+
+    @pytest.mark.parametrize('engine', ['query', 'merge', 'fanout'])
+    def test_follow_feed_engines(
+            self, settings, engine, user_client, user, another_user,
+            many_posts):
+        settings.FOLLOW_FEED_ENGINE = engine
+        Follow.objects.create(user=another_user, author=user)
+        Follow.objects.create(user=user, author=another_user)
+        Post.objects.create(author=another_user, text='Пост автора')
+        cache.clear()
+        assert_query_budget(user_client, '/follow/')
+        assert_query_budget(user_client, '/follow/')
+        assert_query_budget(user_client, '/api/v1/follow/')
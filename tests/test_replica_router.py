@@ -0,0 +1,50 @@
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client
+
+from core.routers import STICKY_COOKIE
+from posts.models import Post
+
+
+@pytest.fixture
+def replica(tmp_path, settings):
+    """Вторая база SQLite со схемой, но без данных: «отставшая» копия."""
+    databases = connections.databases
+    databases['replica'] = {
+        **databases['default'], 'NAME': str(tmp_path / 'replica.sqlite3'),
+    }
+    call_command('migrate', database='replica', verbosity=0)
+    settings.REPLICA_DATABASE = 'replica'
+    settings.REPLICA_STICKY_SECONDS = 60
+    cache.clear()
+    yield 'replica'
+    connections['replica'].close()
+    delattr(connections._connections, 'replica')
+    del databases['replica']
+
+
+@pytest.mark.django_db
+class TestReplicaRouter:
+
+    def test_reads_replica_until_user_writes(
+            self, replica, user, user_client):
+        client = Client()
+        Post.objects.create(author=user, text='Пост из основной базы')
+        url = f'/profile/{user.username}/'
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'Пост из основной базы' not in response.content.decode(), (
+            'Ленты должны читаться с реплики'
+        )
+        response = user_client.post('/create/', {'text': 'Свежий пост'})
+        assert STICKY_COOKIE in response.cookies, (
+            'После записи пользователь должен получить cookie привязки '
+            'к основной базе'
+        )
+        assert 'Свежий пост' in user_client.get(url).content.decode(), (
+            'Писавший пользователь должен видеть свою запись'
+        )
+        assert 'Свежий пост' not in client.get(url).content.decode()
+        assert Post.objects.count() == 2
@@ -0,0 +1,37 @@
+import json
+import logging
+
+import pytest
+from django.core.cache import cache
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestServerTiming:
+
+    def test_header_disabled_by_default(self, client, post):
+        response = client.get('/')
+        assert 'Server-Timing' not in response, (
+            'Заголовок `Server-Timing` не должен появляться, '
+            'пока SERVER_TIMING выключен'
+        )
+
+    def test_header_and_log(self, client, post, settings, caplog):
+        settings.SERVER_TIMING = True
+        settings.SERVER_TIMING_LOG = True
+        cache.clear()
+        with caplog.at_level(logging.INFO, logger='core.timing'):
+            response = client.get('/')
+            client.get('/')
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            assert metric in header, (
+                f'В заголовке `Server-Timing` нет метрики `{metric}`'
+            )
+        first, second = [json.loads(r.getMessage()) for r in caplog.records]
+        assert first['view'] == 'posts:main_page'
+        assert first['db_queries'] > 0
+        assert first['template_ms'] > 0
+        assert second['cache_hits'] > 0, (
+            'Повторный запрос должен попадать в кэш фрагмента'
+        )
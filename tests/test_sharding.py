@@ -0,0 +1,193 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client
+from django.utils import timezone
+
+from posts import archive
+from posts.models import ArchivedPost, Comment, Follow, Group, Post
+from posts.sharding import SHARD_ID_SPAN, shard_for_author, shard_for_id
+
+SHARDS = ['shard0', 'shard1']
+
+
+@pytest.fixture
+def shards(tmp_path, settings):
+    """Два шарда SQLite во временных файлах."""
+    databases = connections.databases
+    settings.POST_SHARDS = SHARDS
+    settings.FOLLOW_FEED_ENGINE = 'query'
+    settings.QUERY_BUDGET_ACTION = None
+    for alias in SHARDS:
+        databases[alias] = {
+            **databases['default'],
+            'NAME': str(tmp_path / f'{alias}.sqlite3'),
+            'PRAGMAS': {'foreign_keys': 'OFF'},
+        }
+        call_command('migrate', database=alias, verbosity=0)
+    cache.clear()
+    yield SHARDS
+    for alias in SHARDS:
+        connections[alias].close()
+        delattr(connections._connections, alias)
+        del databases[alias]
+
+
+def author_on(shard, django_user_model, name):
+    """Пользователь, чьи посты живут в шарде shard."""
+    while True:
+        user = django_user_model.objects.create_user(username=name)
+        if shard_for_author(user.pk) == shard:
+            return user
+        name += '_'
+
+
+def streamed_json(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return json.loads(b''.join(response.streaming_content))
+
+
+@pytest.mark.django_db
+class TestSharding:
+
+    def test_posts_and_comments_live_in_author_shard(
+            self, shards, django_user_model):
+        first = author_on('shard0', django_user_model, 'first')
+        second = author_on('shard1', django_user_model, 'second')
+        post = Post.objects.create(author=second, text='Пост второго')
+        Comment.objects.create(post=post, author=first, text='Комментарий')
+        assert shard_for_id(post.pk) == 'shard1', (
+            'Пост должен получить id из диапазона шарда автора'
+        )
+        assert post.pk > SHARD_ID_SPAN
+        assert Post.objects.using('shard1').filter(pk=post.pk).exists()
+        assert not Post.objects.using('shard0').exists()
+        assert not Post.objects.using('default').exists(), (
+            'С шардами посты не должны попадать в основную базу'
+        )
+        assert Comment.objects.using('shard1').get().post_id == post.pk
+        assert Post.objects.shard_of(post.pk).get().comments_count == 1, (
+            'Счётчик комментариев должен обновляться в шарде поста'
+        )
+        assert first.counters.posts_count == 0
+        second.counters.refresh_from_db()
+        assert second.counters.posts_count == 1
+
+    def test_pages_merge_shards(self, shards, django_user_model):
+        first = author_on('shard0', django_user_model, 'first')
+        second = author_on('shard1', django_user_model, 'second')
+        for number in range(6):
+            Post.objects.create(
+                author=(first, second)[number % 2], text=f'Пост {number}'
+            )
+        client = Client()
+        response = client.get('/')
+        texts = [post.text for post in response.context['page_obj']]
+        assert texts == [f'Пост {number}' for number in range(5, -1, -1)], (
+            'Главная должна сливать посты шардов по (created, id)'
+        )
+        assert response.context['page_obj'][0].author == second
+        response = client.get('/', {'page': 1})
+        assert len(response.context['page_obj']) == 6
+        assert response.context['page_obj'].paginator.count == 6
+        response = client.get(f'/profile/{first.username}/')
+        assert [post.author for post in response.context['page_obj']] == (
+            [first] * 3
+        )
+        post = Post.objects.of_author(second.pk).first()
+        response = client.get(f'/posts/{post.pk}/')
+        assert response.status_code == 200
+        assert response.context['post'] == post
+        assert client.get(f'/posts/{SHARD_ID_SPAN * 5}/').status_code == 404
+
+    def test_writes_and_follow_feed(
+            self, shards, user, user_client, django_user_model):
+        author = author_on('shard1', django_user_model, 'author')
+        Follow.objects.create(user=user, author=author)
+        shard = connections[shard_for_author(user.pk)]
+        executed = []
+        with shard.execute_wrapper(
+                lambda execute, sql, *args: executed.append(sql)
+                or execute(sql, *args)):
+            user_client.post('/create/', {'text': 'Свой пост'})
+        post = Post.objects.of_author(user.pk).get()
+        assert post._state.db == shard.alias
+        assert executed[0].startswith('BEGIN'), (
+            'Запись поста должна идти в транзакции записи его шарда'
+        )
+        user_client.post(f'/posts/{post.pk}/comment/', {'text': 'Ответ'})
+        assert Comment.objects.shard_of(post.pk).get().text == 'Ответ'
+        Post.objects.create(author=author, text='Пост автора')
+        response = user_client.get('/follow/')
+        assert [item.text for item in response.context['page_obj']] == [
+            'Пост автора'
+        ], 'Лента подписок должна собираться из шарда автора'
+
+    def test_api_search_and_admin_read_shards(
+            self, shards, admin_client, django_user_model):
+        first = author_on('shard0', django_user_model, 'first')
+        second = author_on('shard1', django_user_model, 'second')
+        group = Group.objects.create(title='Группа', slug='group')
+        other = Post.objects.create(
+            author=first, group=group, text='Слон первого'
+        )
+        post = Post.objects.create(author=second, text='Слон второго')
+        Comment.objects.create(post=post, author=first, text='Ответ')
+        client = Client()
+        data = streamed_json(client, '/api/v1/posts/')
+        assert [row['text'] for row in data['results']] == [
+            'Слон второго', 'Слон первого'
+        ], 'API должен сливать посты всех шардов'
+        assert data['results'][1]['author'] == first.username
+        assert data['results'][1]['group'] == 'group'
+        data = streamed_json(
+            client, f'/api/v1/profiles/{second.username}/posts/'
+        )
+        assert [row['id'] for row in data['results']] == [post.pk]
+        data = streamed_json(client, '/api/v1/groups/group/posts/')
+        assert [row['author'] for row in data['results']] == [first.username]
+        data = streamed_json(client, f'/api/v1/posts/{post.pk}/')
+        assert data['post']['author'] == second.username
+        assert [row['author'] for row in data['results']] == [
+            first.username
+        ], 'Комментарии поста читаются из его шарда'
+        response = client.get('/search/api/', {'q': 'слон'})
+        assert {row['id'] for row in response.json()['results']} == {
+            post.pk, other.pk
+        }, 'Поиск должен опрашивать индексы всех шардов'
+        response = admin_client.get(
+            '/admin/posts/post/', {'shard': 'shard1', 'q': 'слон'}
+        )
+        assert [obj.pk for obj in response.context['cl'].result_list] == [
+            post.pk
+        ]
+        response = admin_client.get(f'/admin/posts/post/{post.pk}/change/')
+        assert response.status_code == 200
+        assert response.context['original'] == post
+
+    def test_export_reads_shards(self, shards, tmp_path, django_user_model):
+        first = author_on('shard0', django_user_model, 'first')
+        second = author_on('shard1', django_user_model, 'second')
+        post = Post.objects.create(author=second, text='Пост второго')
+        Comment.objects.create(post=post, author=first, text='Ответ')
+        now = timezone.now()
+        cold = ArchivedPost.objects.using('shard0').create(
+            id=SHARD_ID_SPAN - 1, author=first, created=now, updated=now,
+            packed_text=archive.compress('Из архива'),
+        )
+        call_command(
+            'export_content', '--output', str(tmp_path), '--models',
+            'post,comment', stdout=StringIO(),
+        )
+        with open(tmp_path / 'post.jsonl') as source:
+            posts = [json.loads(line) for line in source]
+        assert [(row['id'], row['text']) for row in posts] == [
+            (cold.pk, 'Из архива'), (post.pk, 'Пост второго')
+        ], 'Выгрузка должна читать посты и архив всех шардов по id'
+        with open(tmp_path / 'comment.jsonl') as source:
+            assert [json.loads(line)['text'] for line in source] == ['Ответ']
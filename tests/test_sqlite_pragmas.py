@@ -0,0 +1,32 @@
+import pytest
+from django.conf import settings
+from django.db import connections
+
+
+class TestSqlitePragmas:
+
+    def test_production_profile_is_default(self):
+        database = settings.DATABASES['default']
+        assert database['CONN_MAX_AGE'] > 0, (
+            'Соединения с базой должны переиспользоваться между запросами'
+        )
+        assert database['PRAGMAS']['journal_mode'] == 'WAL'
+
+    @pytest.mark.django_db
+    def test_pragmas_applied_on_connect(self, tmp_path):
+        connection = connections['default']
+        wrapper = connection.__class__(
+            {**connection.settings_dict, 'NAME': str(tmp_path / 'db.sqlite3')},
+            alias='pragmas',
+        )
+        try:
+            with wrapper.cursor() as cursor:
+                values = {}
+                for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+                    cursor.execute(f'PRAGMA {name}')
+                    values[name] = cursor.fetchone()[0]
+        finally:
+            wrapper.close()
+        assert values == {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000,
+        }, 'Прагмы профиля должны выполняться на каждом новом подключении'
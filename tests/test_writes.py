@@ -0,0 +1,93 @@
+import pytest
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core import writes
+
+
+def flaky(failures, effects):
+    """Функция, которая failures раз падает на блокировке базы."""
+    calls = []
+
+    def write():
+        calls.append(1)
+        writes.after_commit(lambda: effects.append(len(calls)))
+        if len(calls) <= failures:
+            raise OperationalError('database is locked')
+        return len(calls)
+    return write
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(settings):
+    settings.WRITE_BACKOFF = 0.001
+    settings.WRITE_RETRIES = 3
+
+
+class TestSerializedWrite:
+
+    def test_begin_immediate(self):
+        executed = []
+        immediate = writes._Immediate()
+        for sql in ('BEGIN', 'SELECT 1'):
+            immediate(
+                lambda sql, *args: executed.append(sql), sql, None, False, {}
+            )
+        assert executed == ['BEGIN IMMEDIATE', 'SELECT 1'], (
+            'Транзакция записи должна сразу брать блокировку записи'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_retry_and_after_commit(self):
+        effects = []
+        before = writes.stats.snapshot()
+        assert writes.run_serialized(flaky(2, effects)) == 3
+        after = writes.stats.snapshot()
+        assert after['retries'] - before['retries'] == 2
+        assert after['transactions'] - before['transactions'] == 1
+        assert effects == [3], (
+            'Кэш обновляется один раз — после фиксации удачной попытки'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_gives_up_with_503(self):
+        effects = []
+        write = flaky(10, effects)
+        view = writes.serialized_write(lambda request: HttpResponse(write()))
+        request = RequestFactory().post('/')
+        response = view(request)
+        assert response.status_code == 503
+        assert response['Retry-After'] == '1'
+        assert effects == []
+
+    @pytest.mark.django_db
+    def test_inside_outer_transaction(self):
+        effects = []
+        with pytest.raises(OperationalError):
+            writes.run_serialized(flaky(1, effects))
+        assert effects == [1], (
+            'Во внешней транзакции повторов нет, а кэш меняется сразу'
+        )
+
+    @pytest.mark.django_db
+    def test_lock_covers_only_save(self, monkeypatch, client):
+        locked = []
+
+        def spy(func, *args, **kwargs):
+            locked.append(func)
+            return func(*args, **kwargs)
+
+        monkeypatch.setattr('users.forms.run_serialized', spy)
+        response = client.post('/auth/signup/', {
+            'first_name': 'Имя', 'last_name': 'Фамилия',
+            'username': 'newbie', 'email': 'newbie@example.com',
+            'password1': 'Sl0zhnyi-parol', 'password2': 'Sl0zhnyi-parol',
+        })
+        assert response.status_code == 302
+        assert len(locked) == 1 and locked[0].__name__ == 'save', (
+            'Под блокировкой записи должен выполняться только save()'
+        )
+        assert locked[0].__self__.password.startswith('pbkdf2'), (
+            'Пароль должен быть захеширован до блокировки записи'
+        )
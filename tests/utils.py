@@ -3,3 +3,32 @@ def get_field_from_context(context, field_type):
         if field not in ('user', 'request') and isinstance(context[field], field_type):
             return context[field]
     return
+
+
+def assert_query_budget(client, url, method='get', data=None):
+    """Запрос к url укладывается в QUERY_BUDGETS; считаются все базы."""
+    from contextlib import ExitStack
+
+    from django.conf import settings
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    from core.middleware import is_budgeted
+
+    with ExitStack() as stack:
+        captured = [
+            stack.enter_context(CaptureQueriesContext(connection))
+            for connection in connections.all()
+        ]
+        response = getattr(client, method)(url, data or {})
+    queries = [
+        query['sql'] for capture in captured
+        for query in capture.captured_queries if is_budgeted(query['sql'])
+    ]
+    view_name = response.resolver_match.view_name
+    budget = settings.QUERY_BUDGETS[view_name]
+    assert len(queries) <= budget, (
+        f'Страница `{url}` (`{view_name}`) выполнила {len(queries)} '
+        f'SQL-запросов при бюджете {budget}:\n' + '\n'.join(queries)
+    )
+    return response
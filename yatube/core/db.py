@@ -0,0 +1,13 @@
+"""Прагмы SQLite для каждого нового подключения.
+
+Набор прагм берётся из DATABASES[alias]['PRAGMAS'] (см. SQLITE_PROFILES
+в настройках) и выполняется на сыром соединении: счётчики запросов и
+бюджеты представлений их не видят.
+"""
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in connection.settings_dict.get('PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
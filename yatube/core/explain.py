@@ -0,0 +1,116 @@
+"""EXPLAIN QUERY PLAN для SQL, выполненного представлениями (SQLite).
+
+StatementRecorder собирает SELECT-запросы, plan() получает план,
+problems() отмечает полный просмотр таблицы и сортировку во временном
+B-дереве, а propose() по WHERE и ORDER BY такого запроса подбирает
+составной индекс: сначала колонки равенства, затем колонки сортировки.
+"""
+import re
+
+from django.apps import apps
+from django.db import connection
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?'
+                       r'(ORDER BY|GROUP BY|DISTINCT)')
+FROM = re.compile(r'\bFROM "?(\w+)')
+ORDER_BY = re.compile(r' ORDER BY (.*?)(?: LIMIT |$)')
+# Длинное имя индекса Django не примет: не больше 30 символов
+INDEX_NAME_LENGTH = 30
+
+
+class StatementRecorder:
+    """execute_wrapper, запоминающий SELECT-запросы без повторов."""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.statements.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+
+def plan(sql, params):
+    """Строки detail из EXPLAIN QUERY PLAN."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def problems(details, sql):
+    """(таблица, описание) для полных просмотров и временных сортировок."""
+    found = []
+    for detail in details:
+        scan = FULL_SCAN.match(detail)
+        if scan:
+            found.append((scan.group(1), 'полный просмотр таблицы'))
+            continue
+        sort = TEMP_SORT.search(detail)
+        if sort:
+            table = FROM.search(sql)
+            found.append((
+                table.group(1) if table else None,
+                f'временное B-дерево для {sort.group(1)}',
+            ))
+    return found
+
+
+def _models_by_table():
+    return {model._meta.db_table: model for model in apps.get_models()}
+
+
+def index_name(model, fields):
+    name = '_'.join(
+        [model._meta.model_name] + [field.lstrip('-') for field in fields]
+    )
+    return name[:INDEX_NAME_LENGTH - len('_idx')].rstrip('_') + '_idx'
+
+
+def propose(sql, table):
+    """(модель, поля индекса) для запроса к table или None.
+
+    Колонки равенства берутся из условий "table"."col" = %s и IN (...),
+    колонки сортировки — из ORDER BY в том же порядке и направлении.
+    """
+    model = _models_by_table().get(table)
+    if model is None:
+        return None
+    names = {
+        field.column: field.name for field in model._meta.concrete_fields
+    }
+    prefix = re.escape(f'"{table}".')
+    fields = []
+    for column in re.findall(prefix + r'"(\w+)" (?:= %s|IN \()', sql):
+        if names.get(column) and names[column] not in fields:
+            fields.append(names[column])
+    ordering = ORDER_BY.search(sql)
+    if ordering:
+        for column, direction in re.findall(
+                prefix + r'"(\w+)" (ASC|DESC)', ordering.group(1)):
+            name = names.get(column)
+            if name and name not in fields:
+                fields.append(('-' if direction == 'DESC' else '') + name)
+    return (model, fields) if fields else None
+
+
+def existing_indexes(model):
+    """Колонки существующих индексов таблицы, без направления."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return [
+        tuple(info['columns']) for info in constraints.values()
+        if info['index'] or info['unique'] or info['primary_key']
+    ]
+
+
+def is_covered(model, fields):
+    """Есть ли индекс, начинающийся с тех же колонок."""
+    columns = tuple(
+        model._meta.get_field(field.lstrip('-')).column for field in fields
+    )
+    return any(
+        index[:len(columns)] == columns for index in existing_indexes(model)
+    )
@@ -0,0 +1,142 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import timing
+
+logger = logging.getLogger('core.query_budget')
+timing_logger = logging.getLogger('core.timing')
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем разрешено."""
+
+
+def is_budgeted(sql):
+    """Идёт ли запрос в бюджет страницы.
+
+    Чтения thumbnail_kvstore (sorl) не идут: это дозаполнение кэша
+    миниатюр, не больше двух на картинку и только пока ключ не в кэше.
+    """
+    return 'thumbnail_kvstore' not in sql
+
+
+class QueryCounter:
+    """execute_wrapper, считающий запросы ко всем базам и их время.
+
+    budgeted — то же без запросов вне бюджета (is_budgeted).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.budgeted = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        if is_budgeted(sql):
+            self.budgeted += 1
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+
+
+def count_queries():
+    """Контекст, навешивающий QueryCounter на все подключения."""
+    counter = QueryCounter()
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+    return stack, counter
+
+
+class QueryBudgetMiddleware:
+    """Сверяет число SQL-запросов запроса с settings.QUERY_BUDGETS.
+
+    Бюджет задаётся для имени URL ('posts:main_page').
+    QUERY_BUDGET_ACTION: 'log' — предупреждение в лог,
+    'raise' — исключение QueryBudgetExceeded, None — выключено.
+    """
+
+    def __init__(self, get_response):
+        self.action = getattr(settings, 'QUERY_BUDGET_ACTION', None)
+        if not self.action:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budgets = settings.QUERY_BUDGETS
+
+    def __call__(self, request):
+        stack, counter = count_queries()
+        with stack:
+            response = self.get_response(request)
+        match = request.resolver_match
+        budget = self.budgets.get(match.view_name) if match else None
+        if budget is not None and counter.budgeted > budget:
+            message = (
+                f'{match.view_name}: {counter.budgeted} SQL-запросов '
+                f'при бюджете {budget} ({request.path})'
+            )
+            if self.action == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class ServerTimingMiddleware:
+    """Время SQL, шаблонов и попадания в кэш в заголовке Server-Timing.
+
+    Включается settings.SERVER_TIMING; SERVER_TIMING_LOG дополнительно
+    пишет ту же сводку JSON-строкой в логгер core.timing. Выключенный
+    middleware не участвует в обработке запроса вовсе.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.log = getattr(settings, 'SERVER_TIMING_LOG', False)
+        timing.install()
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        stack, counter = count_queries()
+        with stack, timing.collect() as stats:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        metrics = [
+            f'db;dur={counter.duration * 1000:.1f};'
+            f'desc="{counter.count} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'cache;desc="hits={stats.cache_hits} '
+            f'misses={stats.cache_misses}"',
+        ]
+        if stats.writes:
+            metrics.append(
+                f'lock;dur={stats.lock_wait * 1000:.1f};'
+                f'desc="retries={stats.write_retries}"'
+            )
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(metrics)
+        if self.log:
+            match = request.resolver_match
+            timing_logger.info(json.dumps({
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(counter.duration * 1000, 1),
+                'db_queries': counter.count,
+                'template_ms': round(stats.template_time * 1000, 1),
+                'cache_hits': stats.cache_hits,
+                'cache_misses': stats.cache_misses,
+                'lock_wait_ms': round(stats.lock_wait * 1000, 1),
+                'write_retries': stats.write_retries,
+            }))
+        return response
@@ -0,0 +1,105 @@
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(obj, direction):
+    """Непрозрачный токен курсора из ключа (created, id) объекта.
+
+    Объектом может быть и строка values() — словарь с created и id.
+    """
+    if isinstance(obj, dict):
+        created, pk = obj['created'], obj['id']
+    else:
+        created, pk = obj.created, obj.pk
+    raw = f'{direction}|{created.isoformat()}|{pk}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(cursor):
+    """Возвращает (direction, created, pk) или None для битого токена."""
+    try:
+        direction, created, pk = force_str(
+            urlsafe_base64_decode(cursor)
+        ).split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or created is None:
+        return None
+    return direction, created, pk
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (created, id): без COUNT(*) и OFFSET.
+
+    Страница по курсору читается одним индексным диапазоном,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    Номерные страницы (?page=N) по-прежнему работают через get_page.
+    """
+
+    def _ordered(self, descending=True):
+        if descending:
+            return self.object_list.order_by('-created', '-pk')
+        return self.object_list.order_by('created', 'pk')
+
+    def get_cursor_page(self, cursor=None):
+        position = decode_cursor(cursor) if cursor else None
+        limit = self.per_page + 1
+        if position is None:
+            rows = list(self._ordered()[:limit])
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            direction, created, pk = position
+            if direction == NEXT:
+                rows = list(self._ordered().filter(
+                    Q(created__lt=created) | Q(created=created, pk__lt=pk)
+                )[:limit])
+                has_next, has_previous = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                rows = list(self._ordered(descending=False).filter(
+                    Q(created__gt=created) | Q(created=created, pk__gt=pk)
+                )[:limit])
+                has_next, has_previous = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+        page = Page(rows, None, self)
+        return self.set_cursors(page, has_next, has_previous)
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        return self.set_cursors(
+            page, page.has_next(), page.has_previous()
+        )
+
+    def set_cursors(self, page, has_next, has_previous):
+        rows = list(page.object_list)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = encode_cursor(rows[-1], NEXT)
+        if rows and has_previous:
+            page.previous_cursor = encode_cursor(rows[0], PREVIOUS)
+        return page
+
+
+def get_cursor_page(request, object_list, per_page, count=None):
+    """Страница для ?cursor=..., номерная — только для явного ?page=N.
+
+    Известное заранее число объектов (count) избавляет номерную
+    страницу от COUNT(*).
+    """
+    paginator = CursorPaginator(object_list, per_page)
+    if count is not None:
+        paginator.count = count
+    page_number = request.GET.get('page')
+    if page_number is not None and 'cursor' not in request.GET:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
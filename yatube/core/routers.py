@@ -0,0 +1,101 @@
+"""Чтение лент с реплики, запись — только в основную базу.
+
+Представления, помеченные replica_reads, читают модели приложений
+REPLICA_APPS из алиаса REPLICA_DATABASE. Сессии и пользователи всегда
+читаются из основной базы: вход и права не зависят от отставания копии.
+
+Кто только что писал, REPLICA_STICKY_SECONDS читает основную базу и
+видит свой пост или комментарий. Любая запись проходит через
+db_for_write, там запрос и помечается; ReplicaStickinessMiddleware
+переносит метку между запросами в cookie — без записи в сессию и для
+анонимов тоже.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'primary_until'
+
+_replica_allowed = ContextVar('replica_allowed', default=False)
+# Писал недавно (cookie) и пишет в этом запросе
+_sticky = ContextVar('sticky_to_primary', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+
+def reading_replica():
+    """Читает ли текущий запрос с реплики."""
+    return bool(
+        settings.REPLICA_DATABASE
+        and _replica_allowed.get()
+        and not _sticky.get()
+        and not _wrote.get()
+    )
+
+
+def replica_reads(view):
+    """Декоратор представления: чтения моделей лент идут на реплику."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_allowed.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_allowed.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (reading_replica()
+                and model._meta.app_label in settings.REPLICA_APPS):
+            return settings.REPLICA_DATABASE
+        # Явно: иначе объект, прочитанный с реплики, тянул бы связанные
+        # объекты оттуда же и за пределами replica_reads
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На реплике те же данные, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """Держит писавшего пользователя на основной базе по cookie."""
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        sticky = _sticky.set(until > time.time())
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote_now = _wrote.get()
+        finally:
+            _sticky.reset(sticky)
+            _wrote.reset(wrote)
+        if wrote_now:
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(time.time() + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,105 @@
+"""Сбор времени шаблонов и попаданий в кэш для ServerTimingMiddleware.
+
+install() один раз оборачивает Template.render и get/get_many
+бэкендов из settings.CACHES. Обёртки пишут в статистику текущего
+запроса из contextvar; вне collect() они почти ничего не стоят.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.template.base import Template
+
+_current = ContextVar('request_timing', default=None)
+_installed = False
+_MISSING = object()
+
+
+class RequestStats:
+    def __init__(self):
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Заполняет core.writes
+        self.writes = 0
+        self.write_retries = 0
+        self.lock_wait = 0.0
+
+
+def current():
+    """Статистика текущего запроса или None вне collect()."""
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        stats = _current.get()
+        if stats is None or stats.template_depth:
+            # Вложенные шаблоны уже учтены во внешнем render
+            return render(self, context)
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            stats.template_time += time.perf_counter() - start
+            stats.template_depth -= 1
+    return wrapper
+
+
+def _counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        stats = _current.get()
+        if stats is None:
+            return get(self, key, default, version)
+        value = get(self, key, _MISSING, version)
+        if value is _MISSING:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version=version)
+        stats = _current.get()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install():
+    global _installed
+    if _installed:
+        return
+    Template.render = _timed_render(Template.render)
+    patched = set()
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if backend in patched:
+            continue
+        backend.get = _counted_get(backend.get)
+        # BaseCache.get_many сам вызывает get, его не считаем дважды
+        if backend.get_many is not BaseCache.get_many:
+            backend.get_many = _counted_get_many(backend.get_many)
+        patched.add(backend)
+    _installed = True
@@ -0,0 +1,194 @@
+"""Запись в SQLite по одному писателю: короткие транзакции BEGIN IMMEDIATE.
+
+SQLite пускает только одного писателя. Отложенная транзакция (обычный
+BEGIN), начавшая с чтения, при первой записи не ждёт чужую блокировку,
+а сразу падает с "database is locked". run_serialized берёт блокировку
+записи в самом начале транзакции (ожидание — busy_timeout из профиля
+базы) и при неудаче повторяет всю функцию после паузы, растущей вдвое
+со случайным разбросом. Счётчики ожиданий и повторов — в stats, в
+Server-Timing запроса и в логгере core.writes.
+
+Кэш меняется только после фиксации: after_commit откладывает обновление
+до COMMIT, чтобы откаченная попытка не оставила в кэше следов.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS, OperationalError, connections, transaction,
+)
+from django.http import HttpResponse
+
+from . import timing
+
+logger = logging.getLogger('core.writes')
+_owned = ContextVar('write_transaction', default=False)
+
+
+class WriteStats:
+    """Счётчики с запуска процесса, общие для всех потоков."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.transactions = 0
+        self.retries = 0
+        self.failures = 0
+        self.lock_wait = 0.0
+        self.max_lock_wait = 0.0
+
+    def record(self, lock_wait, retries, failed):
+        with self._lock:
+            self.transactions += 1
+            self.retries += retries
+            self.failures += failed
+            self.lock_wait += lock_wait
+            self.max_lock_wait = max(self.max_lock_wait, lock_wait)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'transactions': self.transactions,
+                'retries': self.retries,
+                'failures': self.failures,
+                'lock_wait_ms': round(self.lock_wait * 1000, 1),
+                'max_lock_wait_ms': round(self.max_lock_wait * 1000, 1),
+            }
+
+
+stats = WriteStats()
+
+
+def is_locked(error):
+    return 'locked' in str(error)
+
+
+class _Immediate:
+    """execute_wrapper: BEGIN -> BEGIN IMMEDIATE и время его ожидания."""
+
+    def __init__(self):
+        self.wait = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql != 'BEGIN':
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute('BEGIN IMMEDIATE', params, many, context)
+        finally:
+            self.wait += time.perf_counter() - start
+
+
+def backoff(attempt):
+    """Пауза перед повтором attempt: до WRITE_BACKOFF * 2**attempt."""
+    limit = min(
+        settings.WRITE_BACKOFF * 2 ** attempt, settings.WRITE_BACKOFF_MAX
+    )
+    return random.uniform(limit / 2, limit)
+
+
+def after_commit(func):
+    """Выполняет func после COMMIT транзакции run_serialized, иначе сразу."""
+    if _owned.get():
+        transaction.on_commit(func)
+    else:
+        func()
+
+
+def run_serialized(func, *args, **kwargs):
+    """func(*args, **kwargs) в транзакции BEGIN IMMEDIATE с повторами.
+
+    Внутри чужой транзакции (в том числе в тестах) func просто
+    выполняется в ней же: блокировку и откат держит внешний код.
+    """
+    return run_serialized_on(DEFAULT_DB_ALIAS, func, *args, **kwargs)
+
+
+def run_serialized_on(using, func, *args, **kwargs):
+    """run_serialized для базы using (например, шарда постов)."""
+    connection = connections[using]
+    if connection.in_atomic_block:
+        with transaction.atomic(using=using, savepoint=False):
+            return func(*args, **kwargs)
+    immediate = _Immediate()
+    retries = 0
+    failed = True
+    try:
+        while True:
+            token = _owned.set(True)
+            try:
+                with connection.execute_wrapper(immediate), \
+                        transaction.atomic(using=using):
+                    result = func(*args, **kwargs)
+                failed = False
+                return result
+            except OperationalError as error:
+                if not is_locked(error) or retries >= settings.WRITE_RETRIES:
+                    raise
+            finally:
+                _owned.reset(token)
+            pause = backoff(retries)
+            retries += 1
+            logger.warning(
+                'Запись заблокирована (%s): повтор %d через %.0f мс',
+                getattr(func, '__name__', func), retries, pause * 1000,
+            )
+            time.sleep(pause)
+            immediate.wait += pause
+    finally:
+        stats.record(immediate.wait, retries, failed)
+        request_stats = timing.current()
+        if request_stats is not None:
+            request_stats.lock_wait += immediate.wait
+            request_stats.write_retries += retries
+            request_stats.writes += 1
+        if failed and retries:
+            logger.error(
+                'Запись %s не удалась после %d повторов',
+                getattr(func, '__name__', func), retries,
+            )
+
+
+def busy_as_503(view):
+    """Декоратор представления: исчерпанные повторы записи — 503, не 500.
+
+    Клиент получает Retry-After. Само представление оборачивает в
+    run_serialized только вызовы save(): хеширование паролей, проверка
+    и запись картинок, рендеринг шаблонов идут без блокировки записи.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except OperationalError as error:
+            if not is_locked(error):
+                raise
+            response = HttpResponse(
+                'Слишком много записей одновременно, повторите запрос',
+                status=503,
+            )
+            response['Retry-After'] = '1'
+            return response
+    return wrapper
+
+
+def serialized_write(view=None, *, methods=('POST',)):
+    """Декоратор: запросы methods целиком идут через run_serialized.
+
+    Только для коротких представлений, которые пишут и сразу отвечают
+    редиректом (подписка, отписка). Остальные — busy_as_503 и
+    run_serialized вокруг самой записи.
+    """
+    def decorator(view):
+        @busy_as_503
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return view(request, *args, **kwargs)
+            return run_serialized(view, request, *args, **kwargs)
+        return wrapper
+    return decorator(view) if view is not None else decorator
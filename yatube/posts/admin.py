@@ -1,8 +1,39 @@
+from django.conf import settings
 from django.contrib import admin
 
+from . import search, sharding
 from .models import Post, Group, Follow
 
 
+def listed_shard(alias):
+    """Шард списка постов из ?shard=, по умолчанию первый."""
+    return alias if alias in settings.POST_SHARDS else settings.POST_SHARDS[0]
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """С шардами список постов показывает один шард за раз."""
+    title = 'шард'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in settings.POST_SHARDS]
+
+    def queryset(self, request, queryset):
+        # Шард уже выбран в PostAdmin.get_queryset
+        return queryset
+
+    def choices(self, changelist):
+        selected = listed_shard(self.value())
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == selected,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: alias}
+                ),
+                'display': title,
+            }
+
+
 class PostAdmin(admin.ModelAdmin):
     list_display = (
         'pk',
@@ -12,10 +43,41 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    # Без JOIN: с шардами автор и группа подгружаются prefetch
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not sharding.enabled():
+            return queryset
+        return queryset.using(
+            listed_shard(request.GET.get(ShardFilter.parameter_name))
+        )
+
+    def get_list_filter(self, request):
+        if not sharding.enabled():
+            return self.list_filter
+        return (ShardFilter, *self.list_filter)
+
+    def get_object(self, request, object_id, from_field=None):
+        if not sharding.enabled() or from_field is not None:
+            return super().get_object(request, object_id, from_field)
+        # Шард поста виден по его id
+        try:
+            pk = int(object_id)
+        except ValueError:
+            return None
+        return Post.objects.shard_of(pk).filter(pk=pk).first()
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через FTS5-индекс, а не LIKE '%term%'
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
+
 # При регистрации модели Post источником конфигурации для неё назначаем
 # класс PostAdmin
 
@@ -0,0 +1,196 @@
+"""Read-only JSON API (/api/v1/) для тех же лент, что и HTML-страницы.
+
+Посты читаются проекцией values() только нужных колонок, листаются
+курсором по (created, id) и отдаются StreamingHttpResponse: JSON
+кодируется по одному посту, без шаблонов и без моделей.
+
+С шардами (posts.sharding) JOIN с пользователями и группами невозможен:
+строки несут author_id и group_id, а username и slug страницы
+подставляются одним запросом к основной базе на связь.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+
+from core.paginator import CursorPaginator
+from . import following, sharding
+from .conditional import (
+    conditional, group_scopes, index_scopes, post_scopes, profile_scopes
+)
+from .models import Comment, FeedItem, Group, Post, User
+
+# Поле ответа -> колонка values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+# Колонка со связью -> (внешний ключ, модель основной базы, поле)
+RELATED_COLUMNS = {
+    'author__username': ('author_id', User, 'username'),
+    'group__slug': ('group_id', Group, 'slug'),
+}
+
+
+def _project(queryset, fields, prefix=''):
+    """values() с колонками ответа и ключом курсора (created, id)."""
+    columns = list(fields.values())
+    if sharding.enabled():
+        columns = [
+            RELATED_COLUMNS[column][0] if column in RELATED_COLUMNS
+            else column
+            for column in columns
+        ]
+    return queryset.values(
+        'id', 'created', *(prefix + column for column in columns)
+    )
+
+
+def _resolve(rows):
+    """С шардами: username и slug по author_id и group_id строк."""
+    if not sharding.enabled() or not rows:
+        return rows
+    for column, (key, model, field) in RELATED_COLUMNS.items():
+        if key not in rows[0]:
+            continue
+        names = dict(model.objects.filter(
+            pk__in={row[key] for row in rows}
+        ).values_list('pk', field))
+        for row in rows:
+            row[column] = names.get(row[key])
+    return rows
+
+
+def _serialize(row, fields, prefix=''):
+    data = {name: row[prefix + column] for name, column in fields.items()}
+    if 'image' in data:
+        data['image'] = (
+            default_storage.url(data['image']) if data['image'] else None
+        )
+    return data
+
+
+def _page(request, rows, per_page=None):
+    page = CursorPaginator(
+        rows, per_page or settings.POSTS_PER_PAGE
+    ).get_cursor_page(request.GET.get('cursor'))
+    _resolve(page.object_list)
+    return page
+
+
+def _stream(page, fields, prefix='', head=None):
+    """Ответ {**head, results, next_cursor, previous_cursor} по частям."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    def chunks():
+        yield '{'
+        for key, value in (head or {}).items():
+            yield f'{encoder.encode(key)}:{encoder.encode(value)},'
+        yield '"results":['
+        for number, row in enumerate(page.object_list):
+            if number:
+                yield ','
+            yield encoder.encode(_serialize(row, fields, prefix))
+        yield (
+            f'],"next_cursor":{encoder.encode(page.next_cursor)},'
+            f'"previous_cursor":{encoder.encode(page.previous_cursor)}}}'
+        )
+
+    return StreamingHttpResponse(
+        chunks(), content_type='application/json; charset=utf-8'
+    )
+
+
+def _posts(posts=None):
+    """Проекция постов; по умолчанию — всех шардов сразу."""
+    if posts is None:
+        posts = Post.objects.everywhere()
+    return _project(posts, POST_FIELDS)
+
+
+def _pk_or_404(model, **lookup):
+    """id объекта основной базы для фильтра постов в шарде."""
+    pk = model.objects.filter(**lookup).values_list('pk', flat=True).first()
+    if pk is None:
+        raise Http404
+    return pk
+
+
+@conditional(index_scopes)
+def post_list(request):
+    return _stream(_page(request, _posts()), POST_FIELDS)
+
+
+@conditional(group_scopes)
+def group_posts(request, slug):
+    if sharding.enabled():
+        posts = _posts().filter(group_id=_pk_or_404(Group, slug=slug))
+    else:
+        posts = _posts().filter(group__slug=slug)
+    page = _page(request, posts)
+    # Пустая страница — повод проверить, есть ли группа вообще
+    if not page.object_list and not Group.objects.filter(
+            slug=slug).exists():
+        raise Http404
+    return _stream(page, POST_FIELDS)
+
+
+@conditional(profile_scopes)
+def profile_posts(request, username):
+    if sharding.enabled():
+        author_id = _pk_or_404(User, username=username)
+        posts = _posts(Post.objects.of_author(author_id))
+    else:
+        posts = _posts().filter(author__username=username)
+    page = _page(request, posts)
+    if not page.object_list and not User.objects.filter(
+            username=username).exists():
+        raise Http404
+    return _stream(page, POST_FIELDS)
+
+
+def follow_posts(request):
+    """Лента подписок; движок 'merge' читается так же, как 'query'."""
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Требуется вход'}, status=401)
+    if settings.FOLLOW_FEED_ENGINE == 'fanout':
+        items = _project(
+            FeedItem.objects.filter(user=user), POST_FIELDS, 'post__'
+        )
+        return _stream(_page(request, items), POST_FIELDS, 'post__')
+    posts = _posts(
+        Post.objects.of_authors(following.get_following(user.pk))
+    )
+    return _stream(_page(request, posts), POST_FIELDS)
+
+
+@conditional(post_scopes)
+def post_detail(request, post_id):
+    post = _posts(Post.objects.shard_of(post_id)).filter(pk=post_id).first()
+    if post is None:
+        raise Http404
+    _resolve([post])
+    comments = _project(Comment.objects.of_post(post_id), COMMENT_FIELDS)
+    page = _page(request, comments, settings.COMMENTS_PER_PAGE)
+    return _stream(
+        page, COMMENT_FIELDS, head={'post': _serialize(post, POST_FIELDS)}
+    )
+
+
+def post_comments(request, post_id):
+    comments = _project(Comment.objects.of_post(post_id), COMMENT_FIELDS)
+    page = _page(request, comments, settings.COMMENTS_PER_PAGE)
+    return _stream(page, COMMENT_FIELDS)
@@ -0,0 +1,64 @@
+"""Архив старых постов и комментариев (hot/cold).
+
+Команда archive_content переносит посты старше ARCHIVE_AFTER_DAYS без
+свежих комментариев вместе с их комментариями в ArchivedPost и
+ArchivedComment. Текст там сжат zlib, id прежние, поэтому ссылки на
+посты не меняются. Горячие таблицы и их индексы остаются маленькими.
+
+Архив открыт только для чтения: страница поста и профиль читают его
+прозрачно через менеджеры (Post.objects.get_or_archived,
+of_author(..., archived=True), Comment.objects.of_post), общие ленты
+и поиск показывают только горячие посты.
+"""
+import zlib
+
+from django.apps import apps
+
+from .sharding import MergedQuerySet, PostQuerySet, ShardedQuerySet
+
+
+def compress(text):
+    return zlib.compress(text.encode())
+
+
+def decompress(data):
+    return zlib.decompress(data).decode()
+
+
+class HotPostQuerySet(PostQuerySet):
+
+    def of_author(self, author_id, archived=False):
+        """Посты автора; с archived=True — вместе с архивом."""
+        posts = super().of_author(author_id)
+        if not archived:
+            return posts
+        cold = apps.get_model('posts', 'ArchivedPost').objects
+        return MergedQuerySet([posts, cold.of_author(author_id)])
+
+    def get_or_archived(self, pk, *related):
+        """Пост pk или, если он перенесён, его строка из архива.
+
+        related — связи для select_related в обеих таблицах.
+        """
+        cold = apps.get_model('posts', 'ArchivedPost').objects
+        for posts in (self, cold):
+            post = posts.shard_of(pk).select_related(*related).filter(
+                pk=pk
+            ).first()
+            if post is not None:
+                return post
+        raise self.model.DoesNotExist('Нет ни поста, ни его архива')
+
+
+class HotCommentQuerySet(ShardedQuerySet):
+
+    def of_post(self, post_id, archived=False):
+        """Комментарии поста; archived=True — перенесённые в архив.
+
+        Пост переезжает со всеми комментариями, поэтому они целиком
+        лежат либо в горячей таблице, либо в архиве.
+        """
+        comments = self
+        if archived:
+            comments = apps.get_model('posts', 'ArchivedComment').objects
+        return comments.shard_of(post_id).filter(post_id=post_id)
@@ -0,0 +1,106 @@
+"""Условные GET (ETag, Last-Modified) для страниц с постами.
+
+Валидаторы берутся из поколений списков (posts.generations) до вызова
+представления: одно обращение к кэшу и, если в адресе slug, username
+или id поста, один запрос по уникальному индексу. Совпавший
+If-None-Match или If-Modified-Since отдаёт 304 без рендеринга шаблона.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from core.routers import reading_replica
+from . import generations
+from .models import ArchivedPost, Group, Post, User
+
+
+def _validators(request, scopes_for, kwargs):
+    """(etag, last_modified) страницы, один раз на запрос."""
+    if not hasattr(request, '_validators'):
+        request._validators = None, None
+        scopes = scopes_for(**kwargs)
+        if scopes is not None:
+            state = generations.get_state(scopes)
+            # Шапка и кнопки подписки зависят от того, кто смотрит
+            parts = [str(request.user.pk)] + [
+                f'{scope}={generation}'
+                for scope, (generation, _) in sorted(state.items())
+            ]
+            modified = datetime.fromtimestamp(
+                max(modified for _, modified in state.values()),
+                tz=timezone.utc,
+            )
+            if reading_replica():
+                # Копия могла отстать от поколения: такая страница
+                # валидна не дольше REPLICA_CACHE_TIMEOUT
+                window = int(time.time()) // settings.REPLICA_CACHE_TIMEOUT
+                parts.append(f'replica={window}')
+                modified = None
+            raw = ':'.join(parts)
+            request._validators = (
+                hashlib.md5(raw.encode()).hexdigest(), modified
+            )
+    return request._validators
+
+
+def conditional(scopes_for):
+    """condition() с валидаторами из списков scopes_for(**url_kwargs).
+
+    scopes_for возвращает None, если объекта нет: тогда представление
+    вызывается как обычно и само отвечает 404.
+    """
+    def etag(request, *args, **kwargs):
+        return _validators(request, scopes_for, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return _validators(request, scopes_for, kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def index_scopes():
+    return [generations.index_scope()]
+
+
+def group_scopes(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return None
+    return [generations.group_scope(group_id)]
+
+
+def profile_scopes(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return [
+        generations.profile_scope(author_id),
+        generations.follow_scope(author_id),
+    ]
+
+
+def post_scopes(post_id):
+    for posts in (Post.objects, ArchivedPost.objects):
+        row = posts.shard_of(post_id).filter(pk=post_id).values_list(
+            'author_id', 'group_id'
+        ).first()
+        if row is not None:
+            break
+    else:
+        return None
+    author_id, group_id = row
+    # Профиль автора — ради счётчика его постов на странице
+    scopes = [
+        generations.post_scope(post_id),
+        generations.profile_scope(author_id),
+    ]
+    if group_id is not None:
+        scopes.append(generations.group_scope(group_id))
+    return scopes
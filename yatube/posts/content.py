@@ -0,0 +1,298 @@
+"""Построчная выгрузка (export_content) и загрузка (import_content).
+
+Выгрузка читает values_list(...).iterator(chunk_size) в порядке id и
+сразу пишет в файл, поэтому память не растёт с размером таблицы.
+Файл на модель: <model>.jsonl или <model>.csv, по желанию сжатый gzip.
+Перенесённые в архив посты и комментарии (posts.archive) попадают в те
+же файлы post и comment, в тех же колонках и с распакованным текстом.
+С шардами (posts.sharding) читаются все шарды, потоки сливаются по id.
+
+Загрузка читает JSONL с других платформ: авторы и группы указаны
+username и slug, комментарии ссылаются на id поста в источнике.
+"""
+import csv
+import gzip
+import heapq
+import json
+import os
+from contextlib import contextmanager
+from operator import itemgetter
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import decompress
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post, User,
+)
+
+# Порядок выгрузки совпадает с порядком зависимостей по внешним ключам
+MODELS = {
+    'group': Group,
+    'post': Post,
+    'comment': Comment,
+    'follow': Follow,
+}
+FORMATS = ('jsonl', 'csv')
+# Горячая таблица -> её архив
+ARCHIVES = {Post: ArchivedPost, Comment: ArchivedComment}
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def filename(name, fmt, compress=False):
+    return f'{name}.{fmt}' + ('.gz' if compress else '')
+
+
+def open_output(path, compress=False):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def _changed(model, since, until):
+    """Querysets строк model по порядку id, изменённых в [since, until).
+
+    По одному на шард у постов, комментариев и их архива, у остальных
+    моделей — один.
+    """
+    objects = model.objects
+    sources = (
+        objects.each_shard() if hasattr(objects, 'each_shard')
+        else [objects.all()]
+    )
+    # Комментарий в архиве не правится: его момент — created
+    stamp = 'created' if model is ArchivedComment else 'updated'
+    window = {}
+    if hasattr(model, stamp):
+        if since is not None:
+            window[f'{stamp}__gte'] = since
+        if until is not None:
+            window[f'{stamp}__lt'] = until
+    return [queryset.filter(**window).order_by('pk') for queryset in sources]
+
+
+def _unpacked(queryset, names, chunk_size):
+    """Строки архива в колонках names с распакованным текстом."""
+    text = names.index('packed_text')
+    for row in queryset.values_list(*names).iterator(chunk_size=chunk_size):
+        row = list(row)
+        row[text] = decompress(row[text])
+        yield tuple(row)
+
+
+def rows(model, since=None, until=None, chunk_size=2000):
+    """Кортежи значений columns(model), изменённые в [since, until).
+
+    У постов и комментариев — вместе с архивом. Шарды и архив сливаются
+    по id: он у них общий и уникальный.
+    """
+    streams = [
+        queryset.values_list(*columns(model)).iterator(chunk_size=chunk_size)
+        for queryset in _changed(model, since, until)
+    ]
+    if model in ARCHIVES:
+        archive = ARCHIVES[model]
+        present = set(columns(archive))
+        names = [
+            'packed_text' if name == 'text'
+            else name if name in present else 'created'
+            for name in columns(model)
+        ]
+        streams.extend(
+            _unpacked(queryset, names, chunk_size)
+            for queryset in _changed(archive, since, until)
+        )
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=itemgetter(0))
+
+
+def _isoformat(value):
+    # Даты целиком, с микросекундами: выгрузку можно загрузить обратно
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def write_jsonl(output, names, values):
+    encoder = json.JSONEncoder(ensure_ascii=False, default=_isoformat)
+    total = 0
+    for row in values:
+        output.write(encoder.encode(dict(zip(names, row))))
+        output.write('\n')
+        total += 1
+    return total
+
+
+def write_csv(output, names, values):
+    writer = csv.writer(output)
+    writer.writerow(names)
+    total = 0
+    for row in values:
+        writer.writerow(
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row
+        )
+        total += 1
+    return total
+
+
+def export(name, directory, fmt='jsonl', compress=False, **filters):
+    """Выгружает модель в файл каталога directory, возвращает число строк.
+
+    Файл сначала пишется во временный и переименовывается в конце,
+    чтобы прерванная выгрузка не оставила половину файла.
+    """
+    model = MODELS[name]
+    path = os.path.join(directory, filename(name, fmt, compress))
+    writer = write_jsonl if fmt == 'jsonl' else write_csv
+    with open_output(path + '.part', compress) as output:
+        total = writer(output, columns(model), rows(model, **filters))
+    os.replace(path + '.part', path)
+    return total
+
+
+def next_pk(model):
+    """Следующий свободный id: перенесённые в архив строки сохранили свои."""
+    archive = ARCHIVES.get(model)
+    return max(
+        source.objects.aggregate(top=Max('pk'))['top'] or 0
+        for source in (model, archive) if source is not None
+    ) + 1
+
+
+def reserve_pks(model, count):
+    """Резервирует count id подряд, возвращает первый.
+
+    Счётчик AUTOINCREMENT в sqlite_sequence сдвигается за диапазон, и
+    сайт больше не выдаст эти id, даже если вставка в них откатится.
+    Вызывать в отдельной транзакции записи (run_serialized).
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', [table]
+        )
+        row = cursor.fetchone()
+        first = max(row[0] + 1 if row else 1, next_pk(model))
+        last = first + count - 1
+        if row:
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = %s WHERE name = %s',
+                [last, table],
+            )
+        else:
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                [table, last],
+            )
+    return first
+
+
+@contextmanager
+def explicit_created():
+    """bulk_create не затирает created и updated у переданных строк."""
+    fields = [
+        model._meta.get_field(name)
+        for model in (Post, Comment) for name in ('created', 'updated')
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def read_jsonl(path):
+    """Строки JSONL-файла (можно .gz) как словари."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Lookup:
+    """Отображения username -> id и slug -> id, строятся один раз.
+
+    С create_missing неизвестные авторы и группы создаются по ходу
+    загрузки; иначе для них возвращается None и строка пропускается.
+    """
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+
+    def user(self, username):
+        if username not in self.users and self.create_missing:
+            self.users[username] = User.objects.create(
+                username=username, password=make_password(None)
+            ).pk
+        return self.users.get(username)
+
+    def group(self, slug):
+        if slug not in self.groups and self.create_missing:
+            self.groups[slug] = Group.objects.create(
+                title=slug, slug=slug
+            ).pk
+        return self.groups.get(slug)
+
+
+def _moment(value, default):
+    moment = parse_datetime(value) if value else default
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _moments(record):
+    created = _moment(record.get('created'), timezone.now())
+    return created, _moment(record.get('updated'), created)
+
+
+def build_post(record, lookup):
+    """Post из строки источника или None, если автора или группы нет.
+
+    Картинки не рендерятся: пост с image ждёт render_thumbnails.
+    id не задаётся: его выдаёт import_content из резерва (reserve_pks).
+    """
+    author_id = lookup.user(record.get('author'))
+    slug = record.get('group')
+    group_id = lookup.group(slug) if slug else None
+    if author_id is None or (slug and group_id is None):
+        return None
+    created, updated = _moments(record)
+    return Post(
+        author_id=author_id,
+        group_id=group_id,
+        text=record['text'],
+        image=record.get('image') or '',
+        created=created,
+        updated=updated,
+    )
+
+
+def build_comment(record, lookup, posts):
+    """Comment из строки источника; posts — id поста в источнике -> pk."""
+    author_id = lookup.user(record.get('author'))
+    post_id = posts.get(record.get('post'))
+    if author_id is None or post_id is None:
+        return None
+    created, updated = _moments(record)
+    return Comment(
+        post_id=post_id,
+        author_id=author_id,
+        text=record['text'],
+        created=created,
+        updated=updated,
+    )
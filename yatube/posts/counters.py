@@ -0,0 +1,137 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F() из сигналов на Post, Comment и
+Follow. Расхождения исправляет команда reconcile_counters.
+"""
+from itertools import islice
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    ArchivedPost, Comment, Follow, Group, Post, User, UserCounters,
+)
+
+
+def _add(queryset, **deltas):
+    return queryset.update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def bump_user(user_id, **deltas):
+    """Меняет счётчики пользователя, при первом росте создаёт строку."""
+    rows = UserCounters.objects.filter(user_id=user_id)
+    if _add(rows, **deltas) or min(deltas.values()) < 0:
+        return
+    get_user_counters(User(pk=user_id))
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _add(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def bump_post(post_id, delta):
+    _add(
+        Post.objects.shard_of(post_id).filter(pk=post_id),
+        comments_count=delta,
+    )
+
+
+def get_user_counters(user):
+    """Счётчики пользователя; отсутствующие считаются по базе."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        counters, _ = UserCounters.objects.get_or_create(
+            user_id=user.pk,
+            defaults={
+                'posts_count': Post.objects.of_author(
+                    user.pk, archived=True
+                ).count(),
+                'followers_count': Follow.objects.filter(
+                    author=user).count(),
+                'following_count': Follow.objects.filter(
+                    user=user).count(),
+            },
+        )
+        user.counters = counters
+        return counters
+
+
+def _count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(
+        Subquery(
+            rows.values(field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _chunks(queryset, chunk_size):
+    """Диапазоны первичных ключей по chunk_size строк."""
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', flat=True
+            )[:chunk_size]
+        )
+        if not pks:
+            return
+        yield pks[0], pks[-1]
+        last_pk = pks[-1]
+
+
+def _reconcile(model, expected, chunk_size):
+    fixed = 0
+    for first, last in _chunks(model.objects.all(), chunk_size):
+        rows = model.objects.filter(
+            pk__gte=first, pk__lte=last
+        ).annotate(**{f'actual_{f}': e for f, e in expected.items()})
+        stale = []
+        for row in rows:
+            changed = False
+            for field in expected:
+                actual = getattr(row, f'actual_{field}')
+                if getattr(row, field) != actual:
+                    setattr(row, field, actual)
+                    changed = True
+            if changed:
+                stale.append(row)
+        model.objects.bulk_update(stale, list(expected))
+        fixed += len(stale)
+    return fixed
+
+
+def reconcile(chunk_size=1000):
+    """Исправляет расхождения счётчиков, возвращает число строк по моделям."""
+    missing = User.objects.filter(counters__isnull=True).values_list(
+        'pk', flat=True
+    )
+    pks = missing.iterator(chunk_size=chunk_size)
+    while True:
+        batch = [UserCounters(user_id=pk) for pk in islice(pks, chunk_size)]
+        if not batch:
+            break
+        # batch_size не передаём: Django подберёт безопасный для SQLite размер
+        UserCounters.objects.bulk_create(batch, ignore_conflicts=True)
+    return {
+        'users': _reconcile(UserCounters, {
+            # Профиль показывает и архивные посты автора
+            'posts_count': (
+                _count(Post, 'author') + _count(ArchivedPost, 'author')
+            ),
+            'followers_count': _count(Follow, 'author'),
+            'following_count': _count(Follow, 'user'),
+        }, chunk_size),
+        'groups': _reconcile(
+            Group, {'posts_count': _count(Post, 'group')}, chunk_size
+        ),
+        'posts': _reconcile(
+            Post, {'comments_count': _count(Comment, 'post')}, chunk_size
+        ),
+    }
@@ -0,0 +1,105 @@
+"""Лента подписок.
+
+Движок выбирается настройкой FOLLOW_FEED_ENGINE:
+    'query'  — подзапрос по Follow к таблице Post;
+    'fanout' — материализованная таблица FeedItem (fan-out on write);
+    'merge'  — слияние кэшированных таймлайнов авторов (posts.timelines).
+При переключении на 'fanout' таблицу нужно пересобрать: rebuild_feed.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from core.paginator import get_cursor_page
+from . import following, timelines
+from .models import FeedItem, Follow, Post
+
+BATCH_SIZE = 1000
+
+
+def _insert(items):
+    """Вставляет записи ленты пачками по BATCH_SIZE.
+
+    Размер одного INSERT bulk_create выбирает сам: Django 2.2 не урезает
+    явный batch_size до лимита SQLite на число строк в запросе.
+    """
+    items = iter(items)
+    while True:
+        batch = list(islice(items, BATCH_SIZE))
+        if not batch:
+            return
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        FeedItem(user_id=user_id, post_id=post.pk, created=post.created)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя все посты нового автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'created')
+    _insert(
+        FeedItem(user_id=user_id, post_id=pk, created=created)
+        for pk, created in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def fan_out_enabled():
+    return settings.FOLLOW_FEED_ENGINE == 'fanout'
+
+
+def feed_for(user):
+    """Лента пользователя: диапазон по индексу (user, created, id)."""
+    return FeedItem.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def get_feed_page(request):
+    """Страница ленты подписок request.user выбранным движком."""
+    user = request.user
+    engine = settings.FOLLOW_FEED_ENGINE
+    if engine == 'merge':
+        return timelines.get_page(
+            user, request.GET.get('cursor'), settings.POSTS_PER_PAGE
+        )
+    if engine == 'query':
+        return get_cursor_page(
+            request,
+            Post.objects.of_authors(
+                following.get_following(user.pk)
+            ).select_related('author', 'group'),
+            settings.POSTS_PER_PAGE,
+        )
+    page_obj = get_cursor_page(
+        request, feed_for(user), settings.POSTS_PER_PAGE
+    )
+    page_obj.object_list = [item.post for item in page_obj]
+    return page_obj
+
+
+@transaction.atomic
+def rebuild():
+    """Пересобирает ленты целиком из Follow и Post."""
+    FeedItem.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
+    return FeedItem.objects.count()
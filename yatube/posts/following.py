@@ -0,0 +1,52 @@
+"""Кэшированное множество авторов, на которых подписан пользователь.
+
+Кэш только для чтения лент: подписка и отписка пишут в базу всегда,
+а множество живёт FOLLOWING_CACHE_TIMEOUT секунд, чтобы копия другого
+процесса не расходилась с базой дольше этого.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow
+
+FOLLOWING_KEY = 'posts:following:{}'
+
+
+def _key(user_id):
+    return FOLLOWING_KEY.format(user_id)
+
+
+def get_following(user_id):
+    """id авторов, на которых подписан пользователь; из базы — раз."""
+    following = cache.get(_key(user_id))
+    if following is None:
+        following = set(
+            Follow.objects.filter(user_id=user_id).values_list(
+                'author_id', flat=True
+            )
+        )
+        cache.set(
+            _key(user_id), following,
+            timeout=settings.FOLLOWING_CACHE_TIMEOUT,
+        )
+    return following
+
+
+def add(user_id, author_id):
+    following = cache.get(_key(user_id))
+    if following is not None:
+        following.add(author_id)
+        cache.set(
+            _key(user_id), following,
+            timeout=settings.FOLLOWING_CACHE_TIMEOUT,
+        )
+
+
+def discard(user_id, author_id):
+    following = cache.get(_key(user_id))
+    if following is not None:
+        following.discard(author_id)
+        cache.set(
+            _key(user_id), following,
+            timeout=settings.FOLLOWING_CACHE_TIMEOUT,
+        )
@@ -1,3 +1,4 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 from .models import Post, Comment
 from django.utils.translation import ugettext_lazy as _
@@ -18,6 +19,16 @@ class PostForm(ModelForm):
             'image': _('Изображение к посту'),
         }
 
+    def store_image(self):
+        """Кладёт загруженную картинку в хранилище до транзакции записи.
+
+        Тогда save() поста под блокировкой пишет только строку, а повтор
+        транзакции не пишет файл второй раз.
+        """
+        upload = self.cleaned_data.get('image')
+        if isinstance(upload, UploadedFile):
+            self.instance.image.save(upload.name, upload, save=False)
+
 
 class CommentForm(ModelForm):
     class Meta:
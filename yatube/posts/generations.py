@@ -0,0 +1,124 @@
+"""Поколения кэша списков постов.
+
+Ключ фрагмента содержит номер поколения списка и курсор страницы.
+Запись поста или группы увеличивает поколение, и старые фрагменты
+просто перестают читаться, поэтому TTL можно держать длинным.
+Рядом с поколением хранится время последней записи: вместе они служат
+валидаторами условных GET (см. posts.conditional).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import reading_replica
+
+GENERATION_KEY = 'posts:generation:{}'
+MODIFIED_KEY = 'posts:modified:{}'
+
+
+def _key(scope):
+    return GENERATION_KEY.format(scope)
+
+
+def _modified_key(scope):
+    return MODIFIED_KEY.format(scope)
+
+
+def _initial():
+    # Поколение после вытеснения ключа не должно совпасть со старым
+    return int(time.time() * 1000)
+
+
+def get_generation(scope):
+    return cache.get_or_set(_key(scope), _initial, timeout=None)
+
+
+def bump(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.set(_key(scope), _initial(), timeout=None)
+    cache.set_many(
+        {_modified_key(scope): time.time() for scope in scopes},
+        timeout=None,
+    )
+
+
+def get_state(scopes):
+    """Поколения и время последней записи (unix time) набора списков.
+
+    Одно обращение к кэшу; вытесненные ключи создаются заново, и время
+    записи тогда — текущее, чтобы не отдать клиенту устаревший 304.
+    """
+    keys = {}
+    for scope in scopes:
+        keys[_key(scope)] = keys[_modified_key(scope)] = scope
+    stored = cache.get_many(list(keys))
+    missing = {}
+    for scope in scopes:
+        if _key(scope) not in stored:
+            missing[_key(scope)] = _initial()
+        if _modified_key(scope) not in stored:
+            missing[_modified_key(scope)] = time.time()
+    if missing:
+        cache.set_many(missing, timeout=None)
+        stored.update(missing)
+    return {
+        scope: (stored[_key(scope)], stored[_modified_key(scope)])
+        for scope in scopes
+    }
+
+
+def listing_key(request, scope):
+    """Ключ фрагмента списка: поколение и позиция страницы.
+
+    Списки, прочитанные с реплики, кэшируются отдельно: копия могла ещё
+    не получить запись, которая увеличила поколение.
+    """
+    position = request.GET.get('cursor') or request.GET.get('page') or ''
+    source = ':replica' if reading_replica() else ''
+    return f'{get_generation(scope)}:{position}{source}'
+
+
+def listing_timeout():
+    """TTL фрагментов списка; по реплике — не дольше её отставания."""
+    if reading_replica():
+        return settings.REPLICA_CACHE_TIMEOUT
+    return settings.LISTING_CACHE_TIMEOUT
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'profile:{author_id}'
+
+
+def post_scope(post_id):
+    """Страница поста: сам пост и его комментарии."""
+    return f'post:{post_id}'
+
+
+def follow_scope(user_id):
+    """Подписки и подписчики пользователя (счётчики в профиле)."""
+    return f'follow:{user_id}'
+
+
+def bump_for_post(post, *group_ids):
+    """Сбрасывает списки, в которые попадает пост."""
+    scopes = {
+        index_scope(), profile_scope(post.author_id), post_scope(post.pk)
+    }
+    scopes.update(
+        group_scope(group_id)
+        for group_id in (post.group_id, *group_ids)
+        if group_id is not None
+    )
+    bump(*scopes)
@@ -0,0 +1,122 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import get_resolver, reverse
+
+from core import explain
+from posts.models import Group, Post, User
+
+NAMESPACES = ('posts', 'api')
+# Кэш не отвечает вместо базы и не засоряется запросами советчика
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Открывает каждую страницу posts.urls, выполняет EXPLAIN '
+            'QUERY PLAN для её SQL и предлагает недостающие индексы')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--namespace', action='append', dest='namespaces',
+            help=f'Пространства имён URL (по умолчанию {NAMESPACES})',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN разбирается для SQLite')
+        self.verbosity = options['verbosity']
+        self.proposals = {}
+        # Без кэша запросов больше бюджета: предупреждения здесь лишние.
+        # Страницы подписки пишут в базу: всё откатывается в конце
+        with override_settings(CACHES=NO_CACHE, QUERY_BUDGET_ACTION=None,
+                               ALLOWED_HOSTS=['testserver']):
+            with transaction.atomic():
+                self.advise(options['namespaces'] or NAMESPACES)
+                transaction.set_rollback(True)
+        self.report()
+
+    def fixtures(self):
+        """Аргументы URL: самые нагруженные пользователь, пост и группа."""
+        reader = User.objects.filter(posts__isnull=False).order_by(
+            '-counters__following_count', 'pk'
+        ).first()
+        post = Post.objects.order_by('-comments_count', 'pk').first()
+        group = Group.objects.order_by('-posts_count', 'pk').first()
+        if reader is None or post is None or group is None:
+            raise CommandError('База пуста: сначала выполните seed_data')
+        author = User.objects.exclude(pk=reader.pk).order_by(
+            '-counters__followers_count', 'pk'
+        ).first() or reader
+        return reader, {
+            'slug': group.slug,
+            'username': author.username,
+            'post_id': post.pk,
+        }, {'q': post.text.split()[0]}
+
+    def advise(self, namespaces):
+        reader, kwargs, data = self.fixtures()
+        client = Client()
+        client.force_login(reader)
+        resolver = get_resolver()
+        for namespace in namespaces:
+            patterns = resolver.namespace_dict[namespace][1].url_patterns
+            for pattern in patterns:
+                if not pattern.name:
+                    continue
+                url = reverse(f'{namespace}:{pattern.name}', kwargs={
+                    key: kwargs[key] for key in pattern.pattern.converters
+                })
+                self.inspect(f'{namespace}:{pattern.name}', url,
+                             client, data)
+
+    def inspect(self, name, url, client, data):
+        recorder = explain.StatementRecorder()
+        with connection.execute_wrapper(recorder):
+            response = client.get(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.stdout.write(
+            f'{name} {url} — {response.status_code}, '
+            f'SELECT: {len(recorder.statements)}'
+        )
+        for sql, params in recorder.statements.items():
+            details = explain.plan(sql, params)
+            if self.verbosity > 1:
+                self.stdout.write(f'    {sql}')
+                for detail in details:
+                    self.stdout.write(f'      {detail}')
+            for table, problem in explain.problems(details, sql):
+                self.stdout.write(self.style.WARNING(
+                    f'  ! {table}: {problem}'
+                ))
+                if self.verbosity == 1:
+                    short = ' '.join(sql.split())[:200]
+                    self.stdout.write(f'    {short}')
+                proposal = explain.propose(sql, table)
+                if proposal is None:
+                    continue
+                model, fields = proposal
+                if explain.is_covered(model, fields):
+                    continue
+                key = (model, tuple(fields))
+                self.proposals.setdefault(key, set()).add(name)
+
+    def report(self):
+        if not self.proposals:
+            self.stdout.write(self.style.SUCCESS('Новые индексы не нужны'))
+            return
+        self.stdout.write(
+            'Предлагаемые индексы (добавьте в Meta.indexes и выполните '
+            'makemigrations):'
+        )
+        for (model, fields), names in sorted(
+                self.proposals.items(),
+                key=lambda item: (item[0][0].__name__, item[0][1])):
+            self.stdout.write(
+                f'  {model.__name__}: models.Index(fields={list(fields)!r}, '
+                f'name={explain.index_name(model, fields)!r})'
+                f'  # {", ".join(sorted(names))}'
+            )
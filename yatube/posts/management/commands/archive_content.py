@@ -0,0 +1,113 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import writes
+from posts import counters, generations, timelines
+from posts.archive import compress
+from posts.models import (
+    ArchivedComment, ArchivedPost, Comment, FeedItem, Post,
+)
+
+
+class Command(BaseCommand):
+    help = ('Переносит старые посты без свежих комментариев вместе с '
+            'комментариями в архивные таблицы со сжатым текстом')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help='Архивировать посты старше стольких дней',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        moved_posts = moved_comments = 0
+        for posts in Post.objects.each_shard():
+            cold = posts.filter(created__lt=before).exclude(
+                comments__created__gte=before
+            ).order_by('pk')
+            while True:
+                # Выборка, копия и удаление — одна транзакция записи:
+                # новый комментарий или правка поста не попадут между ними
+                batch, comments = writes.run_serialized_on(
+                    posts.db, self.move, cold, options['batch_size'],
+                    posts.db,
+                )
+                if not batch:
+                    break
+                self.forget(batch)
+                moved_posts += len(batch)
+                moved_comments += comments
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{posts.db}: {moved_posts} постов')
+        self.stdout.write(self.style.SUCCESS(
+            f'В архив перенесено постов: {moved_posts}, '
+            f'комментариев: {moved_comments}'
+        ))
+
+    def move(self, cold, batch_size, using):
+        """Переносит пачку постов с комментариями, возвращает её."""
+        posts = list(cold[:batch_size])
+        if not posts:
+            return posts, 0
+        ids = [post.pk for post in posts]
+        comments = list(Comment.objects.using(using).filter(post_id__in=ids))
+        ArchivedPost.objects.using(using).bulk_create([
+            ArchivedPost(
+                id=post.pk,
+                author_id=post.author_id,
+                group_id=post.group_id,
+                created=post.created,
+                updated=post.updated,
+                packed_text=compress(post.text),
+                image=post.image.name,
+                comments_count=post.comments_count,
+                thumbnails_ready=post.thumbnails_ready,
+            )
+            for post in posts
+        ])
+        ArchivedComment.objects.using(using).bulk_create([
+            ArchivedComment(
+                id=comment.pk,
+                post_id=comment.post_id,
+                author_id=comment.author_id,
+                created=comment.created,
+                packed_text=compress(comment.text),
+            )
+            for comment in comments
+        ])
+        # Без сигналов: посты не удалены, а переехали. Счётчик постов
+        # автора учитывает архив, лента подписок и группы — нет.
+        # Удаляются только скопированные комментарии: лишний оставил бы
+        # пост на месте ошибкой внешнего ключа, а не пропал бы молча
+        FeedItem.objects.filter(post_id__in=ids)._raw_delete(using)
+        Comment.objects.filter(
+            pk__in=[comment.pk for comment in comments]
+        )._raw_delete(using)
+        Post.objects.filter(pk__in=ids)._raw_delete(using)
+        return posts, len(comments)
+
+    def forget(self, posts):
+        """После COMMIT: счётчики групп, кэш списков и таймлайны.
+
+        Группы живут в основной базе, а пачка могла переехать в шарде:
+        повтор транзакции не должен уменьшить счётчик дважды.
+        """
+        groups = Counter(post.group_id for post in posts)
+        groups.pop(None, None)
+        for group_id, total in groups.items():
+            counters.bump_group(group_id, -total)
+        authors = {post.author_id for post in posts}
+        for author_id in authors:
+            timelines.drop_timeline(author_id)
+        generations.bump(
+            generations.index_scope(),
+            *(generations.group_scope(group_id) for group_id in groups),
+            *(generations.profile_scope(author_id) for author_id in authors),
+            *(generations.post_scope(post.pk) for post in posts),
+        )
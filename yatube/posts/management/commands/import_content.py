@@ -0,0 +1,183 @@
+import json
+import os
+import time
+from bisect import bisect_right
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import writes
+from posts import counters, feed, sharding
+from posts.content import (
+    Lookup, build_comment, build_post, explicit_created, read_jsonl,
+    reserve_pks,
+)
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты и комментарии из JSONL пачками bulk_create, '
+            'без сигналов и с продолжением после сбоя')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            help='JSONL постов: id, author, group, text, created, image',
+        )
+        parser.add_argument(
+            '--comments',
+            help='JSONL комментариев: post (id поста в источнике), author, '
+                 'text, created; нужен и --posts',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл прогресса (по умолчанию <posts>.checkpoint.json)',
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы, а не пропускать',
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счётчики и ленту после загрузки',
+        )
+
+    def handle(self, *args, **options):
+        if not options['posts']:
+            raise CommandError('Укажите --posts (и при желании --comments)')
+        if sharding.enabled():
+            raise CommandError('Импорт пишет только в основную базу')
+        self.batch_size = options['batch_size']
+        self.checkpoint = (
+            options['checkpoint'] or options['posts'] + '.checkpoint.json'
+        )
+        self.state = self.load_checkpoint()
+        lookup = Lookup(options['create_missing'])
+        # Как в loaddata: внешние ключи проверяются один раз в конце
+        with connection.constraint_checks_disabled(), explicit_created():
+            self.insert(
+                Post, options['posts'],
+                lambda record: build_post(record, lookup),
+            )
+            if options['comments']:
+                posts = self.post_ids(options['posts'])
+                self.insert(
+                    Comment, options['comments'],
+                    lambda record: build_comment(record, lookup, posts),
+                )
+        connection.check_constraints(
+            table_names=[Post._meta.db_table, Comment._meta.db_table]
+        )
+        if not options['skip_derived']:
+            started = time.monotonic()
+            counters.reconcile(self.batch_size)
+            if feed.fan_out_enabled():
+                feed.rebuild()
+            self.stdout.write(
+                f'Счётчики и лента: {time.monotonic() - started:.1f} с'
+            )
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return {}
+        with open(self.checkpoint) as source:
+            return json.load(source)
+
+    def save_checkpoint(self):
+        with open(self.checkpoint + '.part', 'w') as output:
+            json.dump(self.state, output)
+        os.replace(self.checkpoint + '.part', self.checkpoint)
+
+    def progress(self, model):
+        """Число обработанных строк файла модели.
+
+        Каждая пачка из count строк получает id из резерва: строка
+        start + i — id first + i. Пачки записаны в файл прогресса как
+        [start, first, count].
+        Пачка, которую прервали до записи в файл, остаётся в pending:
+        её резерв не выдаётся никому, поэтому строки в нём есть, только
+        если вставка успела зафиксироваться.
+        """
+        entry = self.state.setdefault(model._meta.model_name, {})
+        entry.setdefault('lines', 0)
+        entry.setdefault('batches', [])
+        pending = entry.pop('pending', None)
+        if pending is not None:
+            start, first, count = pending
+            if model.objects.filter(
+                    pk__gte=first, pk__lt=first + count).exists():
+                entry['batches'].append(pending)
+                entry['lines'] = start + count
+            self.save_checkpoint()
+        return entry['lines']
+
+    def insert(self, model, path, build):
+        entry = self.state.setdefault(model._meta.model_name, {})
+        done = self.progress(model)
+        if done:
+            self.stdout.write(
+                f'{model.__name__}: продолжаем после {done} строк'
+            )
+        records = islice(read_jsonl(path), done, None)
+        started = time.monotonic()
+        inserted = skipped = 0
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            objects = []
+            for offset, record in enumerate(batch):
+                obj = build(record)
+                if obj is None:
+                    skipped += 1
+                else:
+                    objects.append((offset, obj))
+            if objects:
+                # id выдаёт база, а не номер строки: посты, созданные на
+                # сайте во время загрузки, их не займут
+                first = writes.run_serialized(reserve_pks, model, len(batch))
+                for offset, obj in objects:
+                    obj.pk = first + offset
+                entry['pending'] = [done, first, len(batch)]
+                self.save_checkpoint()
+                writes.run_serialized(
+                    model.objects.bulk_create, [obj for _, obj in objects]
+                )
+                entry['batches'].append(entry.pop('pending'))
+            done += len(batch)
+            inserted += len(objects)
+            entry['lines'] = done
+            self.save_checkpoint()
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{model.__name__}: {inserted} строк за {elapsed:.1f} с '
+            f'({inserted / max(elapsed, 1e-6):.0f} строк/с), '
+            f'пропущено {skipped}'
+        )
+
+    def post_ids(self, path):
+        """id поста в источнике -> pk загруженного поста."""
+        batches = sorted(self.state['post']['batches'])
+        starts = [start for start, _, _ in batches]
+        numbers = {}
+        for number, record in enumerate(read_jsonl(path)):
+            index = bisect_right(starts, number) - 1
+            if index < 0:
+                continue
+            start, first, count = batches[index]
+            if number < start + count:
+                numbers[record.get('id')] = first + number - start
+        # Пропущенные строки тоже получили id из резерва, но без поста
+        loaded = set()
+        for start, first, count in batches:
+            loaded.update(Post.objects.filter(
+                pk__gte=first, pk__lt=first + count
+            ).values_list('pk', flat=True).iterator())
+        return {
+            source: pk for source, pk in numbers.items() if pk in loaded
+        }
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок из Follow и Post'
+
+    def handle(self, *args, **options):
+        total = feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Лента пересобрана: {total} записей'
+        ))
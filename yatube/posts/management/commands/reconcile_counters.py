@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters, sharding
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк сверять за один проход',
+        )
+
+    def handle(self, *args, **options):
+        if sharding.enabled():
+            # Посчитал бы по пустым таблицам основной базы и обнулил счётчики
+            raise CommandError('Сверка счётчиков не поддерживает шарды')
+        fixed = counters.reconcile(options['chunk_size'])
+        for name, total in fixed.items():
+            self.stdout.write(f'{name}: исправлено {total}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры картинок постов в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов (по умолчанию — число ядер)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько картинок брать из очереди за раз',
+        )
+        parser.add_argument(
+            '--backfill', action='store_true',
+            help='Обработать все картинки из media/posts/',
+        )
+        parser.add_argument(
+            '--watch', type=float, default=None, metavar='SECONDS',
+            help='Не завершаться, а опрашивать очередь с этим интервалом',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if options['backfill']:
+            total = thumbnails.backfill(workers)
+            self.stdout.write(f'Backfill: готово постов {total}')
+        while True:
+            total = thumbnails.render_pending(options['batch_size'], workers)
+            self.stdout.write(f'Готово постов: {total}')
+            if options['watch'] is None:
+                break
+            time.sleep(options['watch'])
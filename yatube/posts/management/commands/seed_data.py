@@ -0,0 +1,205 @@
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import counters, feed, sharding
+from posts.content import explicit_created, next_pk
+from posts.models import Comment, Follow, Group, Post, User
+
+PASSWORD = 'seed-password'
+
+
+def power_law_weights(size, alpha):
+    """Накопленные веса Ципфа: первые элементы популярнее остальных."""
+    total, cum = 0.0, []
+    for rank in range(1, size + 1):
+        total += 1 / rank ** alpha
+        cum.append(total)
+    return cum
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу воспроизводимыми тестовыми данными '
+            'для нагрузочных проверок')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона популярности авторов',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов со сгенерированной картинкой (0..1)',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счётчики и ленту после вставки',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 and (options['posts'] or options['follows']):
+            raise CommandError('Для постов и подписок нужно хотя бы 2 автора')
+        if sharding.enabled():
+            raise CommandError('Наполнение пишет только в основную базу')
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days']).total_seconds()
+        self.words = self.fake.words(nb=3000)
+
+        first_user = next_pk(User)
+        users = range(first_user, first_user + options['users'])
+        first_group = next_pk(Group)
+        groups = range(first_group, first_group + options['groups'])
+        first_post = next_pk(Post)
+        posts = range(first_post, first_post + options['posts'])
+        popularity = power_law_weights(len(users), options['alpha'])
+        # Популярность не должна совпадать с порядком id
+        authors = list(users)
+        self.rng.shuffle(authors)
+
+        with explicit_created():
+            self.insert(User, self.gen_users(users))
+            self.insert(Group, self.gen_groups(groups))
+            self.insert(Post, self.gen_posts(
+                posts, authors, popularity, groups, options['images']
+            ))
+            self.insert(Comment, self.gen_comments(
+                options['comments'], posts, users
+            ))
+            self.insert(Follow, self.gen_follows(
+                users, authors, popularity, options['follows']
+            ))
+        if not options['skip_derived']:
+            started = time.monotonic()
+            counters.reconcile(self.batch_size)
+            if feed.fan_out_enabled():
+                feed.rebuild()
+            self.stdout.write(
+                f'Счётчики и лента: {time.monotonic() - started:.1f} с'
+            )
+        cache.clear()
+
+    def insert(self, model, objects):
+        """bulk_create пачками, по транзакции на пачку."""
+        started = time.monotonic()
+        total = 0
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            total += len(batch)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{model.__name__}: {total} строк за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} строк/с)'
+        )
+
+    def moment(self):
+        return self.now - timedelta(seconds=self.rng.random() * self.span)
+
+    def text(self, low, high):
+        return ' '.join(
+            self.rng.choices(self.words, k=self.rng.randint(low, high))
+        ).capitalize()
+
+    def gen_users(self, users):
+        password = make_password(PASSWORD)
+        for pk in users:
+            yield User(
+                pk=pk,
+                username=f'{self.fake.user_name()}_{pk}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                email=f'user{pk}@example.com',
+                password=password,
+            )
+
+    def gen_groups(self, groups):
+        for pk in groups:
+            yield Group(
+                pk=pk,
+                title=self.text(1, 3),
+                slug=f'group-{pk}',
+                description=self.text(5, 20),
+            )
+
+    def gen_posts(self, posts, authors, popularity, groups, images):
+        for pk in posts:
+            created = self.moment()
+            yield Post(
+                pk=pk,
+                author_id=self.rng.choices(authors, cum_weights=popularity)[0],
+                group_id=(
+                    self.rng.choice(groups)
+                    if groups and self.rng.random() < 0.5 else None
+                ),
+                text=self.text(5, 80),
+                created=created,
+                updated=created,
+                image=(
+                    self.image(pk) if self.rng.random() < images else ''
+                ),
+            )
+
+    def gen_comments(self, total, posts, users):
+        first = next_pk(Comment)
+        for pk in range(first, first + total):
+            created = self.moment()
+            yield Comment(
+                pk=pk,
+                post_id=self.rng.choice(posts),
+                author_id=self.rng.choice(users),
+                text=self.text(2, 30),
+                created=created,
+                updated=created,
+            )
+
+    def gen_follows(self, users, authors, popularity, average):
+        for user_id in users:
+            # Число подписок тоже распределено с тяжёлым хвостом
+            wanted = min(
+                int(self.rng.paretovariate(2) * average / 2), len(authors)
+            )
+            chosen = set(
+                self.rng.choices(authors, cum_weights=popularity, k=wanted)
+            )
+            chosen.discard(user_id)
+            for author_id in sorted(chosen):
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def image(self, pk):
+        color = tuple(self.rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new('RGB', (960, 640), color).save(buffer, 'JPEG')
+        return default_storage.save(
+            f'posts/seed_{pk}.jpg', ContentFile(buffer.getvalue())
+        )
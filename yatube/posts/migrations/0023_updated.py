@@ -0,0 +1,71 @@
+from importlib import import_module
+
+from django.db import migrations, models, transaction
+from django.db.models import F, Max
+
+BATCH_SIZE = 1000
+
+# SQLite пересоздаёт posts_post при AddField/AlterField, и триггеры
+# полнотекстового индекса пропадают вместе со старой таблицей
+search_index = import_module('posts.migrations.0021_post_search_index')
+TRIGGERS = search_index.CREATE_INDEX[1:4]
+DROP_TRIGGERS = search_index.DROP_INDEX[:3]
+
+
+def fill_updated(apps, schema_editor):
+    """updated = created пачками по первичному ключу, по транзакции на пачку.
+
+    Уже заполненные строки пропускаются, поэтому прерванную миграцию
+    можно просто запустить ещё раз.
+    """
+    for name in ('Post', 'Comment'):
+        model = apps.get_model('posts', name)
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        for start in range(0, last + 1, BATCH_SIZE):
+            with transaction.atomic():
+                model.objects.filter(
+                    pk__gte=start,
+                    pk__lt=start + BATCH_SIZE,
+                    updated__isnull=True,
+                ).update(updated=F('created'))
+
+
+def updated_field():
+    return models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name='Дата изменения'
+    )
+
+
+class Migration(migrations.Migration):
+    # Каждая пачка фиксируется сразу, не держа блокировку всю миграцию
+    atomic = False
+
+    dependencies = [
+        ('posts', '0022_comment_post_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_TRIGGERS, TRIGGERS),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(null=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(null=True, editable=False),
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='post',
+            name='updated',
+            field=updated_field(),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='updated',
+            field=updated_field(),
+        ),
+        migrations.RunSQL(TRIGGERS, DROP_TRIGGERS),
+    ]
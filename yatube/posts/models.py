@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import CreatedModel
+from .archive import HotCommentQuerySet, HotPostQuerySet, decompress
+from .sharding import PostQuerySet, ShardedQuerySet
 
 
 User = get_user_model()
@@ -10,6 +12,9 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, max_length=50)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False
+    )
 
     def __str__(self):
         return self.title
@@ -40,13 +45,42 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+    thumbnails_ready = models.BooleanField(
+        'Миниатюры готовы', default=False, editable=False
+    )
+
+    objects = HotPostQuerySet.as_manager()
+    archived = False
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'],
+                name='post_created_id_idx'),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_id_idx'),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа и картинка на момент загрузки: по ним сигнал пересчитает
+        # счётчики и поставит миниатюры в очередь
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -66,13 +100,101 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    objects = HotCommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class ArchivedPost(models.Model):
+    """Пост, перенесённый в архив (posts.archive): только для чтения."""
+    id = models.IntegerField(primary_key=True)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='archived_posts',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        blank=True,
+        null=True,
+        verbose_name='Группа',
+    )
+    created = models.DateTimeField('Дата создания')
+    updated = models.DateTimeField('Дата изменения')
+    packed_text = models.BinaryField('Текст поста, zlib')
+    image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0
+    )
+    thumbnails_ready = models.BooleanField('Миниатюры готовы', default=False)
+
+    objects = PostQuerySet.as_manager()
+    archived = True
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='archpost_author_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
+
+    @property
+    def text(self):
+        return decompress(self.packed_text)
+
+
+class ArchivedComment(models.Model):
+    """Комментарий к посту из архива."""
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='comments',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='archived_comments',
+    )
+    created = models.DateTimeField('Дата создания')
+    packed_text = models.BinaryField('Текст комментария, zlib')
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='archcomment_post_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
+
+    @property
+    def text(self):
+        return decompress(self.packed_text)
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -100,3 +222,55 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user.username} to {self.author.username}'
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
+
+
+class FeedItem(models.Model):
+    """Материализованная лента подписок: строка на пару (читатель, пост)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пост',
+    )
+    created = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-id'],
+                name='feed_user_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_user_post'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
@@ -0,0 +1,128 @@
+"""Полнотекстовый поиск по Post.text через таблицу SQLite FTS5.
+
+Индекс posts_post_fts синхронизируют триггеры на posts_post
+(см. миграцию 0021). Результаты упорядочены по BM25 и листаются
+курсором по ключу (rank, id).
+
+С шардами у каждого шарда свой индекс: страница собирается из лучших
+совпадений всех шардов. BM25 считается по статистике своего шарда,
+при близких размерах шардов порядок почти тот же.
+"""
+import heapq
+import re
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.expressions import RawSQL
+from django.utils.encoding import force_str
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.safestring import mark_safe
+
+from . import sharding
+from .models import Post
+
+# Маркеры подсветки не встречаются в тексте и переживают escape()
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 24
+
+SEARCH_SQL = f"""
+    SELECT rowid, rank,
+           snippet(posts_post_fts, 0, '{MARK_START}', '{MARK_END}', '…',
+                   {SNIPPET_TOKENS})
+    FROM posts_post_fts
+    WHERE posts_post_fts MATCH %s {{after}}
+    ORDER BY rank, rowid
+    LIMIT %s
+"""
+AFTER_SQL = 'AND (rank > %s OR (rank = %s AND rowid > %s))'
+
+
+def match_expression(query):
+    """Запрос пользователя как FTS5-выражение: все слова, без операторов."""
+    words = re.findall(r'\w+', query)
+    return ' '.join('"{}"*'.format(word) for word in words)
+
+
+def encode_cursor(rank, pk):
+    return urlsafe_base64_encode(f'{rank!r}|{pk}'.encode())
+
+
+def decode_cursor(cursor):
+    try:
+        rank, pk = force_str(urlsafe_base64_decode(cursor)).split('|')
+        return float(rank), int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+def _highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(MARK_START, '<mark>').replace(
+            MARK_END, '</mark>')
+    )
+
+
+def search(query, cursor=None, per_page=10):
+    """Страница результатов: посты с атрибутами snippet и rank."""
+    expression = match_expression(query)
+    paginator = Paginator([], per_page)
+    page = Page([], None, paginator)
+    page.next_cursor = page.previous_cursor = None
+    if not expression:
+        return page
+    params = [expression]
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None:
+        rank, pk = after
+        params += [rank, rank, pk]
+    params.append(per_page + 1)
+    sql = SEARCH_SQL.format(after=AFTER_SQL if after else '')
+    found = []
+    for alias in _databases():
+        with connections[alias].cursor() as db:
+            db.execute(sql, params)
+            found.append(db.fetchall())
+    rows = list(heapq.merge(*found, key=lambda row: (row[1], row[0])))
+    rows = rows[:per_page + 1]
+    posts = Post.objects.everywhere().select_related(
+        'author', 'group'
+    ).in_bulk([row[0] for row in rows[:per_page]])
+    for pk, rank, snippet in rows[:per_page]:
+        if pk in posts:
+            post = posts[pk]
+            post.rank = rank
+            post.snippet = _highlight(snippet)
+            page.object_list.append(post)
+    if len(rows) > per_page:
+        pk, rank, _ = rows[per_page - 1]
+        page.next_cursor = encode_cursor(rank, pk)
+    return page
+
+
+def filter_queryset(queryset, query):
+    """Сужает queryset постов до совпадений в индексе (для админки)."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+        [expression],
+    ))
+
+
+def _databases():
+    """Базы с индексом постов: шарды или основная."""
+    if sharding.enabled():
+        return settings.POST_SHARDS
+    return [DEFAULT_DB_ALIAS]
+
+
+def rebuild():
+    for alias in _databases():
+        with connections[alias].cursor() as db:
+            db.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) "
+                "VALUES ('rebuild')"
+            )
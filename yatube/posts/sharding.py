@@ -0,0 +1,300 @@
+"""Шарды постов и комментариев по автору.
+
+Пост хранится в шарде POST_SHARDS[author_id % N], комментарии — рядом
+со своим постом: страница профиля и страница поста читают один шард.
+Пользователи, группы, подписки и счётчики остаются в основной базе.
+Архив (posts.archive) лежит в том же шарде, что и перенесённые строки.
+
+Первичные ключи глобальны: шард с номером i выдаёт id из диапазона
+[i * SHARD_ID_SPAN, (i + 1) * SHARD_ID_SPAN), поэтому шард поста или
+комментария узнаётся по одному id (shard_for_id). Границы диапазонов
+ставит reserve_ids после migrate --database=<шард>.
+
+Общие ленты (главная, группа, подписки) опрашивают все шарды и сливают
+ответы по (created, id): MergedQuerySet. Без POST_SHARDS менеджеры
+возвращают обычные querysets основной базы.
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import prefetch_related_objects
+
+from core import writes
+from core.db import apply_pragmas
+
+SHARD_ID_SPAN = 2 ** 40
+SHARDED_MODELS = {
+    'posts.Post', 'posts.Comment',
+    'posts.ArchivedPost', 'posts.ArchivedComment',
+}
+DEFAULT_ORDERING = ('-created', '-pk')
+
+
+def enabled():
+    return bool(settings.POST_SHARDS)
+
+
+def shard_for_author(author_id):
+    shards = settings.POST_SHARDS
+    return shards[author_id % len(shards)]
+
+
+def shard_for_id(pk):
+    """Шард поста или комментария с id pk; None для чужого диапазона."""
+    index = int(pk) // SHARD_ID_SPAN
+    shards = settings.POST_SHARDS
+    return shards[index] if 0 <= index < len(shards) else None
+
+
+def _sharded(model):
+    return enabled() and model._meta.label in SHARDED_MODELS
+
+
+class ShardRouter:
+    """Запись поста — в шард автора, комментария — в шард поста.
+
+    Чтение направляется только по объекту-подсказке из шарда
+    (post.comments, comment.post); остальное выбирает менеджер через
+    using(), иначе решает следующий роутер.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in settings.POST_SHARDS:
+            return instance._state.db
+        return None
+
+    def db_for_write(self, model, **hints):
+        if not _sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if not isinstance(instance, model):
+            # Связанный объект: comment.post = post
+            if instance._state.db in settings.POST_SHARDS:
+                return instance._state.db
+            return None
+        if instance.pk is not None:
+            return shard_for_id(instance.pk)
+        if model._meta.label == 'posts.Post':
+            return shard_for_author(instance.author_id)
+        return shard_for_id(instance.post_id)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Автор и группа поста живут в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return None
+
+
+def reserve_ids(using, **kwargs):
+    """post_migrate: начало диапазона id шарда в sqlite_sequence."""
+    if using not in settings.POST_SHARDS:
+        return
+    from .models import Comment, Post
+    base = settings.POST_SHARDS.index(using) * SHARD_ID_SPAN
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in (Post, Comment):
+            table = model._meta.db_table
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = MAX(seq, %s) '
+                'WHERE name = %s', [base, table]
+            )
+            if not cursor.rowcount:
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) '
+                    'VALUES (%s, %s)', [table, base]
+                )
+    # Схема миграций снова включила внешние ключи, а авторов и групп
+    # в шарде нет
+    apply_pragmas(None, connection)
+
+
+def save_serialized(obj, **kwargs):
+    """obj.save(**kwargs) в run_serialized, пост и комментарий — в шарде.
+
+    Сам объект пишется в шард, счётчики автора и группы — в основную
+    базу, поэтому BEGIN IMMEDIATE берётся в обеих: сначала в основной,
+    затем в шарде. Без шардов — обычный run_serialized.
+    """
+    using = ShardRouter().db_for_write(type(obj), instance=obj)
+    if using is None:
+        return writes.run_serialized(obj.save, **kwargs)
+    return writes.run_serialized(
+        writes.run_serialized_on, using, obj.save, **kwargs
+    )
+
+
+class MergedQuerySet:
+    """Одна выборка из нескольких querysets, слитая по ключу сортировки.
+
+    Части — одинаковые выборки из разных шардов или из горячей таблицы
+    и архива. Умеет то, чем пользуются пагинаторы, ленты и API: filter,
+    exclude, order_by (все поля в одну сторону), select_related, values,
+    count, in_bulk, срезы и итерацию. Срез [a:b] читает первые b строк каждой
+    части и сливает их heapq.merge. С шардами связанные объекты из
+    основной базы подгружаются одним prefetch на уже слитую страницу.
+    """
+    ordered = True
+
+    def __init__(self, querysets, ordering=DEFAULT_ORDERING, related=()):
+        self.querysets = list(querysets)
+        self.model = self.querysets[0].model
+        self.ordering = tuple(ordering)
+        self.related = tuple(related)
+
+    def _chain(self, method, *args, **kwargs):
+        return MergedQuerySet([
+            getattr(queryset, method)(*args, **kwargs)
+            for queryset in self.querysets
+        ], self.ordering, self.related)
+
+    def all(self):
+        return self._chain('all')
+
+    def filter(self, *args, **kwargs):
+        return self._chain('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._chain('exclude', *args, **kwargs)
+
+    def order_by(self, *fields):
+        return MergedQuerySet(self.querysets, fields, self.related)
+
+    def values(self, *fields):
+        return self._chain('values', *fields)
+
+    def select_related(self, *fields):
+        if not enabled():
+            return self._chain('select_related', *fields)
+        return MergedQuerySet(
+            self.querysets, self.ordering, self.related + fields
+        )
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def in_bulk(self, id_list):
+        found = {}
+        for queryset in self.querysets:
+            ids = [
+                pk for pk in id_list
+                if not enabled() or shard_for_id(pk) == queryset.db
+            ]
+            if ids:
+                found.update(queryset.in_bulk(ids))
+        self._prefetch(list(found.values()))
+        return found
+
+    def _key(self, obj):
+        if isinstance(obj, dict):
+            # Строка values(): pk в ней называется id
+            return tuple(
+                obj['id' if name == 'pk' else name]
+                for name in (field.lstrip('-') for field in self.ordering)
+            )
+        return tuple(
+            getattr(obj, field.lstrip('-')) for field in self.ordering
+        )
+
+    def _merged(self, limit=None):
+        parts = []
+        for queryset in self.querysets:
+            queryset = queryset.order_by(*self.ordering)
+            parts.append(queryset[:limit] if limit is not None else queryset)
+        return heapq.merge(
+            *parts, key=self._key, reverse=self.ordering[0].startswith('-')
+        )
+
+    def _prefetch(self, rows):
+        if self.related and rows:
+            prefetch_related_objects(rows, *self.related)
+        return rows
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if index.step is not None or index.stop is None:
+            raise ValueError('Нужен срез [start:stop] без шага')
+        start = index.start or 0
+        rows = islice(self._merged(index.stop), start, index.stop)
+        return self._prefetch(list(rows))
+
+    def __iter__(self):
+        return iter(self._prefetch(list(self._merged())))
+
+    def __len__(self):
+        return self.count()
+
+
+class ShardedQuerySet(models.QuerySet):
+    """QuerySet постов и комментариев, знающий про шарды."""
+
+    def select_related(self, *fields):
+        # JOIN с таблицами основной базы из шарда невозможен
+        if enabled() and fields and fields != (None,):
+            return self.prefetch_related(*fields)
+        return super().select_related(*fields)
+
+    def create(self, **kwargs):
+        if not enabled() or self._db is not None:
+            return super().create(**kwargs)
+        # Без using() роутер выбирает шард по самому объекту
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+    def each_shard(self):
+        """Querysets по одному на шард (без шардов — один)."""
+        if not enabled():
+            return [self.all()]
+        return [self.using(alias) for alias in settings.POST_SHARDS]
+
+    def everywhere(self):
+        """Выборка по всем шардам сразу."""
+        if not enabled():
+            return self.all()
+        return MergedQuerySet(
+            self.using(alias) for alias in settings.POST_SHARDS
+        )
+
+    def shard_of(self, pk):
+        """Шард объекта с id pk; для комментариев поста — id поста."""
+        if not enabled():
+            return self.all()
+        alias = shard_for_id(pk)
+        return self.using(alias) if alias else self.none()
+
+
+class PostQuerySet(ShardedQuerySet):
+
+    def of_author(self, author_id):
+        """Посты автора: один шард."""
+        posts = self.filter(author_id=author_id)
+        if not enabled():
+            return posts
+        return posts.using(shard_for_author(author_id))
+
+    def of_authors(self, author_ids):
+        """Посты авторов: шарды, где они живут, слитые по (created, id)."""
+        if not enabled():
+            return self.filter(author_id__in=author_ids)
+        ids = defaultdict(list)
+        for author_id in author_ids:
+            ids[shard_for_author(author_id)].append(author_id)
+        return MergedQuerySet(
+            self.using(alias).filter(author_id__in=ids[alias])
+            if ids[alias] else self.using(alias).none()
+            for alias in settings.POST_SHARDS
+        )
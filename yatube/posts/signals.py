@@ -0,0 +1,172 @@
+from functools import partial
+
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from core.writes import after_commit
+
+from . import counters, feed, following, generations, timelines
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post, User,
+    UserCounters,
+)
+
+# Поля пользователя, которые видны на карточках постов и комментариев
+DISPLAYED_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def _distinct(querysets, field, **lookup):
+    """Значения field строк lookup из всех шардов querysets."""
+    values = set()
+    for objects in querysets:
+        for rows in objects.each_shard():
+            values.update(
+                rows.filter(**lookup).values_list(field, flat=True).distinct()
+            )
+    values.discard(None)
+    return values
+
+
+def _displayed(user):
+    return {name: user.__dict__.get(name) for name in DISPLAYED_USER_FIELDS}
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    # Имя на момент загрузки: по нему user_saved видит, что оно сменилось
+    instance._loaded_names = _displayed(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    names = _displayed(instance)
+    loaded, instance._loaded_names = instance._loaded_names, names
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+        return
+    if names == loaded:
+        # Вход, смена пароля, правка в админке без смены имени
+        return
+    # Имя автора — в списках с его постами, имя комментатора — на
+    # страницах постов, которые он обсуждал
+    groups = _distinct((Post.objects,), 'group_id', author_id=instance.pk)
+    posts = _distinct(
+        (Comment.objects, ArchivedComment.objects), 'post_id',
+        author_id=instance.pk,
+    )
+    after_commit(partial(
+        generations.bump,
+        generations.index_scope(),
+        generations.profile_scope(instance.pk),
+        *(generations.group_scope(group_id) for group_id in groups),
+        *(generations.post_scope(post_id) for post_id in posts),
+    ))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded_group_id = getattr(
+        instance, '_loaded_group_id', instance.group_id
+    )
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        counters.bump_group(instance.group_id, 1)
+        after_commit(partial(timelines.drop_timeline, instance.author_id))
+        if feed.fan_out_enabled():
+            feed.fan_out_post(instance)
+    else:
+        if loaded_group_id != instance.group_id:
+            counters.bump_group(loaded_group_id, -1)
+            counters.bump_group(instance.group_id, 1)
+        loaded_image = getattr(instance, '_loaded_image', None)
+        if loaded_image is not None and loaded_image != instance.image.name:
+            # Новая картинка снова ставит пост в очередь миниатюр
+            Post.objects.shard_of(instance.pk).filter(
+                pk=instance.pk
+            ).update(thumbnails_ready=False)
+            instance.thumbnails_ready = False
+    after_commit(
+        partial(generations.bump_for_post, instance, loaded_group_id)
+    )
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    counters.bump_group(instance.group_id, -1)
+    after_commit(partial(timelines.drop_timeline, instance.author_id))
+    after_commit(partial(generations.bump_for_post, instance))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Ссылка на группу есть и на карточках в профилях её авторов;
+    # до удаления, пока посты ещё ссылаются на группу
+    authors = _distinct(
+        (Post.objects, ArchivedPost.objects), 'author_id',
+        group_id=instance.pk,
+    )
+    after_commit(partial(
+        generations.bump,
+        generations.index_scope(), generations.group_scope(instance.pk),
+        *(generations.profile_scope(author_id) for author_id in authors),
+    ))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1)
+        after_commit(partial(
+            generations.bump, generations.post_scope(instance.post_id)
+        ))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+    after_commit(partial(
+        generations.bump, generations.post_scope(instance.post_id)
+    ))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        after_commit(partial(
+            following.add, instance.user_id, instance.author_id
+        ))
+        counters.bump_user(instance.user_id, following_count=1)
+        counters.bump_user(instance.author_id, followers_count=1)
+        after_commit(partial(
+            generations.bump,
+            generations.follow_scope(instance.user_id),
+            generations.follow_scope(instance.author_id),
+        ))
+        if feed.fan_out_enabled():
+            feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    after_commit(partial(
+        following.discard, instance.user_id, instance.author_id
+    ))
+    counters.bump_user(instance.user_id, following_count=-1)
+    counters.bump_user(instance.author_id, followers_count=-1)
+    after_commit(partial(
+        generations.bump,
+        generations.follow_scope(instance.user_id),
+        generations.follow_scope(instance.author_id),
+    ))
+    if feed.fan_out_enabled():
+        feed.prune(instance.user_id, instance.author_id)
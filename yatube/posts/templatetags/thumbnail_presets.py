@@ -0,0 +1,19 @@
+import logging
+
+from django import template
+
+from posts import thumbnails
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+@register.simple_tag
+def preset_thumbnail(image, geometry):
+    """Миниатюра из THUMBNAIL_PRESETS или None, если её не получить."""
+    try:
+        return thumbnails.get_preset(image, geometry)
+    except Exception:
+        logger.exception('Нет миниатюры %s для %s', geometry, image)
+        return None
@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import explain
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+GROUP_SQL = (
+    'SELECT "posts_post"."id" FROM "posts_post" '
+    'INNER JOIN "auth_user" ON ("posts_post"."author_id" = "auth_user"."id") '
+    'WHERE "posts_post"."group_id" = %s '
+    'ORDER BY "posts_post"."created" DESC, "posts_post"."id" DESC LIMIT 11'
+)
+
+
+class ExplainTests(TestCase):
+    def test_problems(self):
+        self.assertEqual(
+            explain.problems(
+                ['SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY'],
+                GROUP_SQL,
+            ),
+            [
+                ('posts_post', 'полный просмотр таблицы'),
+                ('posts_post', 'временное B-дерево для ORDER BY'),
+            ],
+        )
+        self.assertEqual(explain.problems([
+            'SCAN posts_post USING INDEX post_created_id_idx',
+            'SEARCH auth_user USING INTEGER PRIMARY KEY (rowid=?)',
+        ], GROUP_SQL), [])
+
+    def test_propose(self):
+        self.assertEqual(
+            explain.propose(GROUP_SQL, 'posts_post'),
+            (Post, ['group', '-created', '-id']),
+        )
+        self.assertIsNone(explain.propose(GROUP_SQL, 'posts_post_fts'))
+        self.assertTrue(
+            explain.is_covered(Post, ['group', '-created', '-id'])
+        )
+        self.assertTrue(explain.is_covered(Follow, ['author']))
+        self.assertFalse(explain.is_covered(Post, ['text']))
+        self.assertEqual(
+            explain.index_name(Post, ['group', '-created', '-id']),
+            'post_group_created_id_idx',
+        )
+
+    def test_command_needs_no_new_indexes(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(
+            author=reader, group=group, text='Слово и ещё слово'
+        )
+        Comment.objects.create(post=post, author=author, text='Да')
+        output = StringIO()
+        call_command('advise_indexes', stdout=output)
+        self.assertIn('posts:group_page', output.getvalue())
+        self.assertIn('Новые индексы не нужны', output.getvalue())
+        # Подписка со страницы profile_follow откатывается
+        self.assertFalse(Follow.objects.exists())
@@ -0,0 +1,110 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(settings.POSTS_PER_PAGE + 5)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Последний'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTests.reader)
+
+    def get_json(self, client, url, data=None):
+        response = client.get(url, data or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_post_list_pages_with_cursor(self):
+        url = reverse('api:post_list')
+        with CaptureQueriesContext(connection) as queries:
+            first = self.get_json(self.client, url)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(first['results']), settings.POSTS_PER_PAGE)
+        self.assertEqual(first['results'][0], {
+            'id': ApiTests.post.pk,
+            'text': 'Последний',
+            'created': ApiTests.post.created.isoformat()[:23] + 'Z',
+            'updated': ApiTests.post.updated.isoformat()[:23] + 'Z',
+            'author': 'author',
+            'group': 'group',
+            'image': None,
+            'comments_count': 1,
+        })
+        second = self.get_json(
+            self.client, url, {'cursor': first['next_cursor']}
+        )
+        self.assertEqual(len(second['results']), 6)
+        self.assertIsNone(second['next_cursor'])
+        self.assertFalse(
+            {post['id'] for post in first['results']}
+            & {post['id'] for post in second['results']}
+        )
+
+    def test_group_and_profile_posts(self):
+        for url in [
+            reverse('api:group_posts', kwargs={'slug': 'group'}),
+            reverse('api:profile_posts', kwargs={'username': 'author'}),
+        ]:
+            with self.subTest(url=url):
+                data = self.get_json(self.client, url)
+                self.assertEqual(
+                    data['results'][0]['id'], ApiTests.post.pk
+                )
+        empty = self.get_json(
+            self.client,
+            reverse('api:profile_posts', kwargs={'username': 'reader'}),
+        )
+        self.assertEqual(empty['results'], [])
+        for url in [
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile_posts', kwargs={'username': 'missing'}),
+            reverse('api:post_detail', kwargs={'post_id': 999}),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_post_detail_with_comments(self):
+        data = self.get_json(self.client, reverse(
+            'api:post_detail', kwargs={'post_id': ApiTests.post.pk}
+        ))
+        self.assertEqual(data['post']['text'], 'Последний')
+        self.assertEqual(
+            [comment['author'] for comment in data['results']], ['reader']
+        )
+
+    def test_follow_posts(self):
+        url = reverse('api:follow_posts')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.get_json(self.reader_client, url)['results'], [])
+        Follow.objects.create(user=ApiTests.reader, author=ApiTests.author)
+        data = self.get_json(self.reader_client, url)
+        self.assertEqual(len(data['results']), settings.POSTS_PER_PAGE)
+        self.assertEqual(data['results'][0]['id'], ApiTests.post.pk)
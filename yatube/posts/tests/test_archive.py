@@ -0,0 +1,130 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.management.commands import archive_content
+from posts.models import ArchivedComment, ArchivedPost, Comment, Group, Post
+
+User = get_user_model()
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        cache.clear()
+        old = timezone.now() - timedelta(days=400)
+        self.cold = Post.objects.create(
+            author=self.author, group=self.group, text='Старый пост ' * 20
+        )
+        self.discussed = Post.objects.create(
+            author=self.author, text='Старый, но обсуждаемый'
+        )
+        self.hot = Post.objects.create(author=self.author, text='Свежий')
+        Post.objects.filter(
+            pk__in=[self.cold.pk, self.discussed.pk]
+        ).update(created=old)
+        self.old_comment = Comment.objects.create(
+            post=self.cold, author=self.author, text='Давний комментарий'
+        )
+        Comment.objects.filter(pk=self.old_comment.pk).update(created=old)
+        Comment.objects.create(
+            post=self.discussed, author=self.author, text='Свежий ответ'
+        )
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def archive(self):
+        call_command('archive_content', '--days', '365', stdout=StringIO())
+
+    def test_moves_cold_posts_with_comments(self):
+        self.archive()
+        self.assertEqual(
+            set(Post.objects.values_list('pk', flat=True)),
+            {self.discussed.pk, self.hot.pk},
+        )
+        archived = ArchivedPost.objects.get()
+        self.assertEqual(archived.pk, self.cold.pk)
+        self.assertEqual(archived.text, self.cold.text)
+        self.assertLess(len(archived.packed_text), len(self.cold.text))
+        self.assertEqual(archived.comments_count, 1)
+        self.assertFalse(Comment.objects.filter(post_id=self.cold.pk))
+        self.assertEqual(
+            ArchivedComment.objects.get().text, 'Давний комментарий'
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 3)
+        self.archive()
+        self.assertEqual(ArchivedPost.objects.count(), 1)
+
+    def test_pages_read_through_archive(self):
+        self.archive()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.cold.pk})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['post'].archived)
+        self.assertContains(response, 'Давний комментарий')
+        self.assertNotContains(
+            response,
+            reverse('posts:post_edit', kwargs={'post_id': self.cold.pk}),
+        )
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'author'})
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.hot.pk, self.discussed.pk, self.cold.pk],
+        )
+        self.assertEqual(response.context['count'], 3)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertNotIn(self.cold, response.context['page_obj'])
+        comments = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.cold.pk})
+        ).context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments], [self.old_comment.pk]
+        )
+        missing = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6})
+        )
+        self.assertEqual(missing.status_code, 404)
+
+
+class ArchiveRaceTests(TransactionTestCase):
+    def test_uncopied_comment_aborts_move(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, text='Старый пост')
+        Post.objects.filter(pk=post.pk).update(
+            created=timezone.now() - timedelta(days=400)
+        )
+        real_compress = archive_content.compress
+
+        def compress(text):
+            # Комментарий, которого нет в прочитанной пачке
+            if not Comment.objects.exists():
+                Comment.objects.create(
+                    post=post, author=author, text='Поздний ответ'
+                )
+            return real_compress(text)
+
+        with mock.patch.object(archive_content, 'compress', compress):
+            with self.assertRaises(IntegrityError):
+                call_command('archive_content', stdout=StringIO())
+        # Пачка откатилась целиком: пост на месте, архив пуст
+        self.assertEqual(Post.objects.get().text, 'Старый пост')
+        self.assertFalse(ArchivedPost.objects.exists())
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+
+    def urls(self):
+        return [
+            reverse('posts:main_page'),
+            reverse('posts:group_page', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': ConditionalGetTests.post.pk},
+            ),
+        ]
+
+    def test_not_modified_without_rendering(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('Last-Modified'))
+                repeat = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(repeat.status_code, 304)
+                self.assertEqual(repeat.templates, [])
+                since = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(since.status_code, 304)
+
+    def test_writes_change_validators(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Post.objects.create(
+            author=ConditionalGetTests.author,
+            group=ConditionalGetTests.group,
+            text='Ещё пост',
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_comment_and_follow_change_validators(self):
+        detail, profile = self.urls()[3], self.urls()[2]
+        etag = self.client.get(detail)['ETag']
+        Comment.objects.create(
+            post=ConditionalGetTests.post,
+            author=ConditionalGetTests.reader,
+            text='Комментарий',
+        )
+        self.assertEqual(
+            self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+        etag = self.client.get(profile)['ETag']
+        Follow.objects.create(
+            user=ConditionalGetTests.reader, author=ConditionalGetTests.author
+        )
+        self.assertEqual(
+            self.client.get(profile, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_etag_depends_on_viewer(self):
+        url = reverse('posts:main_page')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.reader_client.get(url)['ETag'], etag)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_objects_still_404(self):
+        for url in [
+            reverse('posts:group_page', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 999}),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
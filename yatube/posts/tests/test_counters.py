@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(CountersTests.author)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        post = Post.objects.create(
+            author=CountersTests.author, text='Ещё', group=CountersTests.group
+        )
+        self.assertEqual(self.counters(CountersTests.author).posts_count, 2)
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 2)
+        post.delete()
+        self.assertEqual(self.counters(CountersTests.author).posts_count, 1)
+
+    def test_edit_moves_group_counter(self):
+        self.author_client.post(
+            reverse('posts:post_edit',
+                    kwargs={'post_id': CountersTests.post.pk}),
+            data={'text': 'Правка', 'group': CountersTests.other_group.pk},
+        )
+        self.assertEqual(
+            Group.objects.get(pk=CountersTests.group.pk).posts_count, 0)
+        self.assertEqual(
+            Group.objects.get(pk=CountersTests.other_group.pk).posts_count,
+            1)
+
+    def test_comment_and_follow_counters(self):
+        Comment.objects.create(
+            post=CountersTests.post, author=CountersTests.reader, text='Ок'
+        )
+        Follow.objects.create(
+            user=CountersTests.reader, author=CountersTests.author
+        )
+        CountersTests.post.refresh_from_db()
+        self.assertEqual(CountersTests.post.comments_count, 1)
+        self.assertEqual(
+            self.counters(CountersTests.author).followers_count, 1)
+        self.assertEqual(
+            self.counters(CountersTests.reader).following_count, 1)
+
+    def test_reconcile_counters_command(self):
+        UserCounters.objects.filter(user=CountersTests.author).update(
+            posts_count=42)
+        Post.objects.filter(pk=CountersTests.post.pk).update(
+            comments_count=7)
+        UserCounters.objects.filter(user=CountersTests.reader).delete()
+        stranger = User.objects.create_user(username='stranger')
+        UserCounters.objects.filter(user=stranger).delete()
+        call_command('reconcile_counters', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.counters(CountersTests.author).posts_count, 1)
+        self.assertEqual(
+            UserCounters.objects.filter(
+                user__in=[CountersTests.reader, stranger]).count(), 2)
+        CountersTests.post.refresh_from_db()
+        self.assertEqual(CountersTests.post.comments_count, 0)
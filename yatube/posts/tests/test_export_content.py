@@ -0,0 +1,122 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import archive
+from posts.models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post,
+)
+
+User = get_user_model()
+
+
+class ExportContentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        cls.old_post = Post.objects.create(author=author, text='Старый')
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            updated=timezone.now() - timedelta(days=10)
+        )
+        cls.post = Post.objects.create(
+            author=author, group=group, text='Новый, "с кавычками"'
+        )
+        Comment.objects.create(post=cls.post, author=reader, text='Да')
+        Follow.objects.create(user=reader, author=author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def export(self, *args):
+        call_command(
+            'export_content', '--output', self.directory, *args,
+            stdout=StringIO(),
+        )
+
+    def read_jsonl(self, name):
+        with open(os.path.join(self.directory, name)) as source:
+            return [json.loads(line) for line in source]
+
+    def test_jsonl_export(self):
+        self.export()
+        posts = self.read_jsonl('post.jsonl')
+        self.assertEqual(
+            [post['id'] for post in posts],
+            [ExportContentTests.old_post.pk, ExportContentTests.post.pk],
+        )
+        self.assertEqual(posts[1]['text'], 'Новый, "с кавычками"')
+        self.assertEqual(
+            posts[1]['created'], ExportContentTests.post.created.isoformat()
+        )
+        self.assertEqual(len(self.read_jsonl('comment.jsonl')), 1)
+        self.assertEqual(len(self.read_jsonl('follow.jsonl')), 1)
+        self.assertEqual(len(self.read_jsonl('group.jsonl')), 1)
+        self.assertFalse(any(
+            name.endswith('.part') for name in os.listdir(self.directory)
+        ))
+
+    def test_csv_gzip_since(self):
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        self.export('--format', 'csv', '--gzip', '--since', since,
+                    '--models', 'post,follow')
+        path = os.path.join(self.directory, 'post.csv.gz')
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as source:
+            rows = list(csv.DictReader(source))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], 'Новый, "с кавычками"')
+        with open(os.path.join(self.directory, 'manifest.json')) as source:
+            manifest = json.load(source)
+        self.assertEqual(manifest['rows'], {'post': 1, 'follow': 1})
+        self.assertFalse(
+            os.path.exists(os.path.join(self.directory, 'comment.csv.gz'))
+        )
+
+    def test_archive_is_exported(self):
+        old = timezone.now() - timedelta(days=400)
+        Post.objects.filter(pk=ExportContentTests.old_post.pk).update(
+            created=old, updated=old
+        )
+        call_command('archive_content', stdout=StringIO())
+        self.assertTrue(ArchivedPost.objects.exists())
+        Comment.objects.create(
+            post=ExportContentTests.post,
+            author=ExportContentTests.post.author,
+            text='Ещё',
+        )
+        ArchivedComment.objects.create(
+            id=10 ** 6, post_id=ExportContentTests.old_post.pk,
+            author_id=ExportContentTests.post.author_id, created=old,
+            packed_text=archive.compress('Из архива'),
+        )
+        self.export()
+        posts = self.read_jsonl('post.jsonl')
+        self.assertEqual(
+            [(post['id'], post['text']) for post in posts],
+            [(ExportContentTests.old_post.pk, 'Старый'),
+             (ExportContentTests.post.pk, 'Новый, "с кавычками"')],
+        )
+        self.assertEqual(posts[0]['created'], old.isoformat())
+        comments = self.read_jsonl('comment.jsonl')
+        self.assertEqual(
+            [comment['text'] for comment in comments],
+            ['Да', 'Ещё', 'Из архива'],
+        )
+        self.assertEqual(comments[2]['updated'], comments[2]['created'])
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        self.export('--since', since)
+        self.assertEqual(len(self.read_jsonl('post.jsonl')), 1)
+        self.assertEqual(len(self.read_jsonl('comment.jsonl')), 2)
@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timelines
+from posts.models import FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Старый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(FeedTests.reader)
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': FeedTests.author.username}))
+
+    def test_follow_backfills_feed(self):
+        self.follow()
+        self.assertTrue(FeedItem.objects.filter(
+            user=FeedTests.reader, post=FeedTests.old_post).exists())
+
+    def test_follow_backfills_many_posts(self):
+        # Больше строк, чем SQLite допускает в одном составном INSERT
+        Post.objects.bulk_create(
+            Post(author=FeedTests.author, text=f'Пост {number}')
+            for number in range(600)
+        )
+        self.follow()
+        self.assertEqual(
+            FeedItem.objects.filter(user=FeedTests.reader).count(), 601)
+
+    def test_new_post_fans_out(self):
+        self.follow()
+        post = Post.objects.create(author=FeedTests.author, text='Новый')
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_unfollow_prunes_feed(self):
+        self.follow()
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': FeedTests.author.username}))
+        self.assertFalse(
+            FeedItem.objects.filter(user=FeedTests.reader).exists())
+
+    def test_rebuild_feed_command(self):
+        self.follow()
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feed', stdout=StringIO())
+        self.assertEqual(
+            FeedItem.objects.filter(user=FeedTests.reader).count(),
+            Post.objects.filter(author=FeedTests.author).count(),
+        )
+        self.assertTrue(Follow.objects.filter(
+            user=FeedTests.reader, author=FeedTests.author).exists())
+
+
+@override_settings(FOLLOW_FEED_ENGINE='merge', POSTS_PER_PAGE=2)
+class MergeFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(2)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(MergeFeedTests.reader)
+
+    def test_merge_feed_pages(self):
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i in range(3)
+            for author in MergeFeedTests.authors
+        ][::-1]
+        url = reverse('posts:follow_index')
+        seen = []
+        cursor = None
+        while True:
+            data = {'cursor': cursor} if cursor else {}
+            page_obj = self.reader_client.get(url, data).context['page_obj']
+            seen.extend(page_obj)
+            cursor = page_obj.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(seen, posts)
+        self.assertFalse(FeedItem.objects.exists())
+
+    def test_new_post_visible_in_cached_timeline(self):
+        url = reverse('posts:follow_index')
+        self.reader_client.get(url)
+        post = Post.objects.create(
+            author=MergeFeedTests.authors[0], text='Свежий пост'
+        )
+        self.assertIsNone(
+            cache.get(timelines.TIMELINE_KEY.format(post.author_id)),
+            'Новый пост должен сбрасывать таймлайн автора, а не дописывать',
+        )
+        page_obj = self.reader_client.get(url).context['page_obj']
+        self.assertEqual(page_obj[0], post)
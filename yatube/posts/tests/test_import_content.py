@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ImportFilesMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.posts = self.write('posts.jsonl', [
+            {'id': 'a', 'author': 'author', 'group': 'group',
+             'text': 'Первый', 'created': '2020-01-02T03:04:05+00:00'},
+            {'id': 'b', 'author': 'stranger', 'text': 'Чужой'},
+            {'id': 'c', 'author': 'author', 'text': 'Третий'},
+        ])
+        self.comments = self.write('comments.jsonl', [
+            {'post': 'a', 'author': 'author', 'text': 'К первому'},
+            {'post': 'b', 'author': 'author', 'text': 'К чужому'},
+            {'post': 'c', 'author': 'author', 'text': 'К третьему'},
+        ])
+
+    def write(self, name, records):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as output:
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def load(self, *args):
+        call_command(
+            'import_content', '--posts', self.posts,
+            '--comments', self.comments, '--batch-size', '2', *args,
+            stdout=StringIO(),
+        )
+
+
+class ImportContentTests(ImportFilesMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def test_import_skips_unknown_authors(self):
+        self.load()
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            ['Первый', 'Третий'],
+        )
+        first = Post.objects.get(text='Первый')
+        self.assertEqual(first.group, ImportContentTests.group)
+        self.assertEqual(first.created.year, 2020)
+        self.assertEqual(first.updated, first.created)
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', flat=True)),
+            ['К первому', 'К третьему'],
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.comments_count, 1)
+        self.assertEqual(
+            Group.objects.get(slug='group').posts_count, 1
+        )
+        self.assertEqual(
+            User.objects.get(username='author').counters.posts_count, 2
+        )
+
+    def test_create_missing(self):
+        self.load('--create-missing')
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertFalse(
+            User.objects.get(username='stranger').has_usable_password()
+        )
+
+    def test_resume_does_not_duplicate(self):
+        self.load()
+        self.load()
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        with open(self.posts, 'a') as output:
+            output.write(json.dumps(
+                {'id': 'd', 'author': 'author', 'text': 'Дописанный'}
+            ) + '\n')
+        self.load()
+        self.assertEqual(Post.objects.count(), 3)
+
+    def append(self, record):
+        with open(self.posts, 'a') as output:
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def test_resume_after_site_posts(self):
+        self.load()
+        site = Post.objects.create(
+            author=ImportContentTests.author, text='С сайта'
+        )
+        self.append({'id': 'd', 'author': 'author', 'text': 'Дописанный'})
+        self.load()
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            ['Первый', 'Третий', 'С сайта', 'Дописанный'],
+        )
+        self.assertEqual(Post.objects.get(pk=site.pk).text, 'С сайта')
+        # id резерва сайт не выдаёт: следующий пост — после импорта
+        later = Post.objects.create(
+            author=ImportContentTests.author, text='Позже'
+        )
+        self.assertGreater(later.pk, Post.objects.get(text='Дописанный').pk)
+
+    def test_committed_batch_without_checkpoint(self):
+        self.load()
+        checkpoint = self.posts + '.checkpoint.json'
+        with open(checkpoint) as source:
+            state = json.load(source)
+        # Пачка зафиксирована, а файл прогресса записать не успели
+        pending = state['post']['batches'].pop()
+        state['post']['pending'] = pending
+        state['post']['lines'] = pending[0]
+        with open(checkpoint, 'w') as output:
+            json.dump(state, output)
+        self.load()
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+
+
+class ImportFailureTests(ImportFilesMixin, TransactionTestCase):
+    """Сбой вставки: резерв id уже зафиксирован, пачка — нет."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='author')
+        Group.objects.create(title='Группа', slug='group')
+
+    def test_failed_batch_is_retried(self):
+        real = QuerySet.bulk_create
+        calls = []
+
+        def bulk_create(queryset, objs, *args, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 2:
+                raise RuntimeError('Сбой посреди загрузки')
+            return real(queryset, objs, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', bulk_create):
+            with self.assertRaises(RuntimeError):
+                self.load()
+        Post.objects.create(author=self.author, text='С сайта')
+        self.load()
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Первый', 'С сайта', 'Третий'],
+        )
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', flat=True)),
+            ['К первому', 'К третьему'],
+        )
+        self.assertEqual(
+            Comment.objects.get(text='К третьему').post.text, 'Третий'
+        )
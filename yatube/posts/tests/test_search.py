@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Котики <b>правят</b> интернетом',
+        )
+        Post.objects.create(author=cls.user, text='Про собак')
+
+    def results(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['page_obj']
+
+    def test_search_finds_and_highlights(self):
+        page_obj = self.results('котики')
+        self.assertEqual(list(page_obj), [SearchTests.post])
+        self.assertIn('<mark>Котики</mark>', page_obj[0].snippet)
+        self.assertIn('&lt;b&gt;', page_obj[0].snippet)
+
+    def test_index_follows_updates_and_deletes(self):
+        post = Post.objects.create(author=SearchTests.user, text='Ежи')
+        self.assertEqual(list(self.results('ежи')), [post])
+        Post.objects.filter(pk=post.pk).update(text='Ужи')
+        self.assertEqual(list(self.results('ежи')), [])
+        self.assertEqual(list(self.results('ужи')), [post])
+        post.delete()
+        self.assertEqual(list(self.results('ужи')), [])
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_search_cursor(self):
+        for i in range(3):
+            Post.objects.create(author=SearchTests.user, text=f'Рыбки {i}')
+        first = self.results('рыбки')
+        second = self.results('рыбки', cursor=first.next_cursor)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertIsNone(second.next_cursor)
+        self.assertFalse(set(first) & set(second))
+
+    def test_search_api(self):
+        response = self.client.get(
+            reverse('posts:search_api'), {'q': 'собак'}
+        )
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['author'], SearchTests.user.username)
+
+    def test_admin_filter_and_rebuild(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(
+            list(search.filter_queryset(Post.objects.all(), 'котики')),
+            [SearchTests.post],
+        )
+        self.assertFalse(search.filter_queryset(Post.objects.all(), '!!'))
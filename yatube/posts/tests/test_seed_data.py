@@ -0,0 +1,40 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+
+class SeedDataTests(TestCase):
+    def seed(self):
+        call_command(
+            'seed_data', users=20, groups=3, posts=50, comments=40,
+            follows=4, seed=7, stdout=StringIO(),
+        )
+        return list(User.objects.order_by('pk').values_list(
+            'username', flat=True))
+
+    def test_seed_data_counts(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            sum(UserCounters.objects.values_list('posts_count', flat=True)),
+            50,
+        )
+
+    def test_seed_data_is_reproducible(self):
+        first = self.seed()
+        first_texts = list(Post.objects.order_by('pk').values_list(
+            'text', flat=True))
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertEqual(self.seed(), first)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            first_texts,
+        )
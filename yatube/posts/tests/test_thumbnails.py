@@ -0,0 +1,85 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail.base import ThumbnailBackend
+
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=ThumbnailTests.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            ),
+        )
+
+    def test_page_falls_back_to_original_image(self):
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertFalse(self.post.thumbnails_ready)
+        self.assertContains(response, self.post.image.url)
+
+    def test_render_thumbnails_command(self):
+        call_command('render_thumbnails', workers=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnails_ready)
+        # Шаблоны берут миниатюры тех же размеров с теми же параметрами:
+        # находят их в kvstore и ничего не рендерят сами
+        with mock.patch.object(
+                ThumbnailBackend, '_create_thumbnail') as create:
+            for url in (reverse('posts:main_page'),
+                        reverse('posts:post_detail', args=[self.post.pk])):
+                response = self.client.get(url)
+                self.assertNotContains(response, self.post.image.url)
+                self.assertContains(response, 'cache/')
+        create.assert_not_called()
+
+    def test_new_image_requeues_post(self):
+        Post.objects.filter(pk=self.post.pk).update(thumbnails_ready=True)
+        post = Post.objects.get(pk=self.post.pk)
+        post.image = SimpleUploadedFile(
+            name='other.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        post.save()
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnails_ready)
@@ -1,4 +1,7 @@
+import os
 import shutil
+import subprocess
+import sys
 import tempfile
 
 from django.core.cache import cache
@@ -7,8 +10,11 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from posts import following, generations
 from posts.models import Post, Group, Comment, Follow
 
 User = get_user_model()
@@ -72,6 +78,7 @@ class PostTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.get(
             username='auth'
         )
@@ -196,6 +203,52 @@ class PostTests(TestCase):
                 response = self.client.get(route + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 5)
 
+    def test_cursor_paginator(self):
+        route = reverse('posts:group_page', kwargs={'slug': 'test'})
+        first = self.client.get(route).context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertIsNone(first.previous_cursor)
+        second = self.client.get(
+            route, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), 5)
+        self.assertIsNone(second.next_cursor)
+        self.assertFalse(
+            {post.pk for post in first} & {post.pk for post in second}
+        )
+        back = self.client.get(
+            route, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in first]
+        )
+        broken = self.client.get(route, {'cursor': 'garbage'})
+        self.assertEqual(len(broken.context['page_obj']), 10)
+
+    def test_comments_cursor(self):
+        post = Post.objects.create(author=PostTests.user, text='Обсуждаемый')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=PostTests.user, text=f'Коммент {number}')
+            for number in range(settings.COMMENTS_PER_PAGE + 3)
+        )
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        ).context['comments']
+        self.assertEqual(len(first), settings.COMMENTS_PER_PAGE)
+        self.assertIsNotNone(first.next_cursor)
+        route = reverse('posts:post_comments', kwargs={'post_id': post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(route, {'cursor': first.next_cursor})
+        self.assertEqual(len(queries), 1)
+        rest = response.context['comments']
+        self.assertEqual(len(rest), 3)
+        self.assertIsNone(rest.next_cursor)
+        self.assertFalse(
+            {comment.pk for comment in first}
+            & {comment.pk for comment in rest}
+        )
+        self.assertNotContains(response, '<html')
+
     def test_post_with_group(self):
         group_test = Group.objects.create(slug='test_2')
         Post.objects.create(
@@ -246,6 +299,137 @@ class PostTests(TestCase):
         self.assertNotIn(post_to_delete.text,
                          response.content.decode("utf-8"))
 
+    def test_listing_cache_generations(self):
+        cache.clear()
+        first_page = self.client.get(reverse('posts:main_page'))
+        second_page = self.client.get(reverse('posts:main_page'), {
+            'cursor': first_page.context['page_obj'].next_cursor,
+        })
+        self.assertNotEqual(first_page.content, second_page.content)
+        new_post = Post.objects.create(
+            text='Свежий пост в кэше',
+            author=self.user,
+            group=PostTests.group,
+        )
+        routes = [
+            reverse('posts:main_page'),
+            reverse('posts:group_page', kwargs={'slug': 'test'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        ]
+        for route in routes:
+            with self.subTest(route=route):
+                response = self.client.get(route)
+                self.assertIn(new_post.text, response.content.decode())
+
+    def test_generation_bump_reaches_other_processes(self):
+        scope = generations.index_scope()
+        before = generations.get_generation(scope)
+        # Так сбрасывают кэш команды: render_thumbnails, archive_content
+        subprocess.run(
+            [sys.executable, '-c', (
+                'import django; django.setup(); '
+                'from posts import generations; '
+                'generations.bump(generations.index_scope())'
+            )],
+            cwd=settings.BASE_DIR, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yatube.settings'},
+        )
+        self.assertNotEqual(generations.get_generation(scope), before)
+
+    def test_post_edit_touches_updated(self):
+        cache.clear()
+        post = Post.objects.create(text='До правки', author=self.user)
+        updated = post.updated
+        self.client.get(reverse('posts:main_page'))
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'После правки'},
+        )
+        post.refresh_from_db()
+        self.assertGreater(post.updated, updated)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'После правки')
+        self.assertNotContains(response, 'До правки')
+
+    def test_post_edit_keeps_uploaded_image(self):
+        post = Post.objects.create(text='Без картинки', author=self.user)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {
+                'text': 'С картинкой',
+                'image': SimpleUploadedFile(
+                    name='edit.gif',
+                    content=PostTests.post.image.open('rb').read(),
+                    content_type='image/gif',
+                ),
+            },
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'С картинкой')
+        self.assertTrue(post.image.name.startswith('posts/edit'))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertFalse(post.thumbnails_ready)
+
+    def test_post_cards_follow_group_slug(self):
+        cache.clear()
+        self.client.get(reverse('posts:main_page'))
+        group = Group.objects.get(pk=PostTests.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(
+            response, reverse('posts:group_page', kwargs={'slug': 'renamed'})
+        )
+        self.assertNotContains(
+            response, reverse('posts:group_page', kwargs={'slug': 'test'})
+        )
+
+    def test_pages_follow_author_rename(self):
+        cache.clear()
+        Post.objects.create(
+            text='Пост с автором', author=self.user, group=PostTests.group
+        )
+        routes = [
+            reverse('posts:main_page'),
+            reverse('posts:group_page', kwargs={'slug': 'test'}),
+        ]
+        for route in routes:
+            self.client.get(route)
+        generation = generations.get_generation(generations.index_scope())
+        self.client.force_login(self.user)
+        self.assertEqual(
+            generations.get_generation(generations.index_scope()),
+            generation,
+            'Вход в систему не должен сбрасывать кэш списков',
+        )
+        self.user.set_password('новый-пароль')
+        self.user.save()
+        self.assertEqual(
+            generations.get_generation(generations.index_scope()),
+            generation,
+            'Смена пароля не должна сбрасывать кэш списков',
+        )
+        # Смена пароля завершает сессию — входим заново
+        self.client.force_login(self.user)
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        for route in routes:
+            with self.subTest(route=route):
+                self.assertContains(self.client.get(route), 'Новое Имя')
+
+    def test_profile_follows_group_slug(self):
+        cache.clear()
+        route = reverse('posts:profile', kwargs={'username': 'auth'})
+        self.client.get(route)
+        group = Group.objects.get(pk=PostTests.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        self.assertContains(
+            self.client.get(route),
+            reverse('posts:group_page', kwargs={'slug': 'renamed'}),
+        )
+
     def test_follow_view(self):
         self.authorized_client.get(reverse(
             'posts:profile_follow',
@@ -267,6 +451,48 @@ class PostTests(TestCase):
                 author=PostTests.user_to_follow,
             ).exists())
 
+    def test_profile_reads_cached_following(self):
+        route = reverse('posts:profile', kwargs={'username': 'auth'})
+        # Множество уже в кэше: подписка обновляет его на месте
+        self.authorized_client_sub.get(route)
+        self.authorized_client_sub.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user.username}))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client_sub.get(route)
+        self.assertTrue(response.context['following'])
+        self.assertFalse(any(
+            'posts_follow' in query['sql']
+            for query in queries.captured_queries
+        ))
+        self.authorized_client_sub.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user.username}))
+        response = self.authorized_client_sub.get(route)
+        self.assertFalse(response.context['following'])
+
+    def test_follow_writes_ignore_stale_cache(self):
+        follow = reverse(
+            'posts:profile_follow', kwargs={'username': self.user.username}
+        )
+        unfollow = reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user.username}
+        )
+        rows = Follow.objects.filter(user=PostTests.sub, author=self.user)
+        # Кэш другого процесса не знает о подписке
+        self.authorized_client_sub.get(follow)
+        cache.set(following.FOLLOWING_KEY.format(PostTests.sub.pk), set())
+        self.authorized_client_sub.get(unfollow)
+        self.assertFalse(rows.exists())
+        # ...или ещё помнит отменённую
+        cache.set(
+            following.FOLLOWING_KEY.format(PostTests.sub.pk), {self.user.pk}
+        )
+        self.authorized_client_sub.get(follow)
+        self.assertTrue(rows.exists())
+        self.authorized_client_sub.get(follow)
+        self.assertEqual(rows.count(), 1)
+
     def test_if_sub_see_post(self):
         self.authorized_client_sub.get(reverse(
             'posts:profile_follow',
@@ -0,0 +1,91 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Пост с новой картинкой получает thumbnails_ready=False — это и есть
+очередь. Команда render_thumbnails рендерит все размеры из
+settings.THUMBNAIL_PRESETS в пуле процессов и отмечает посты готовыми.
+Пока миниатюр нет, шаблоны показывают исходную картинку. Шаблоны
+берут миниатюры тегом preset_thumbnail (posts.templatetags) с теми же
+параметрами, поэтому находят готовые в kvstore и ничего не рендерят.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from sorl.thumbnail import get_thumbnail
+
+from . import generations
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = 'posts/'
+
+
+def get_preset(image, geometry):
+    """Миниатюра image размера geometry из THUMBNAIL_PRESETS."""
+    return get_thumbnail(
+        image, geometry, **settings.THUMBNAIL_PRESETS[geometry]
+    )
+
+
+def render_image(name):
+    """Рендерит все размеры одной картинки; выполняется в дочернем процессе."""
+    try:
+        for geometry in settings.THUMBNAIL_PRESETS:
+            get_preset(name, geometry)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры для %s', name)
+        return name, False
+    return name, True
+
+
+def render_images(names, workers=None):
+    """Рендерит картинки параллельно, возвращает успешно обработанные."""
+    if not names:
+        return []
+    # Дочерние процессы открывают собственные подключения к базе
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [name for name, ok in pool.map(render_image, names) if ok]
+
+
+def mark_ready(names):
+    """Отмечает посты готовыми и сбрасывает кэш списков с ними."""
+    marked = 0
+    for posts in Post.objects.filter(
+            image__in=names, thumbnails_ready=False).each_shard():
+        for post in posts.only('pk', 'author_id', 'group_id'):
+            generations.bump_for_post(post)
+        marked += posts.update(thumbnails_ready=True)
+    return marked
+
+
+def render_pending(batch_size=100, workers=None):
+    """Обрабатывает очередь пачками, возвращает число готовых постов."""
+    done = 0
+    failed = set()
+    while True:
+        pending = Post.objects.filter(thumbnails_ready=False).exclude(
+            image=''
+        ).exclude(image__in=failed).values_list('image', flat=True)
+        names = set()
+        for posts in pending.each_shard():
+            names.update(posts.distinct()[:batch_size - len(names)])
+            if len(names) >= batch_size:
+                break
+        names = list(names)
+        if not names:
+            return done
+        rendered = render_images(names, workers)
+        failed.update(set(names) - set(rendered))
+        done += mark_ready(rendered)
+
+
+def backfill(workers=None):
+    """Рендерит все картинки из media/posts/, возвращает число постов."""
+    _, files = default_storage.listdir(UPLOAD_DIR)
+    names = [os.path.join(UPLOAD_DIR, name) for name in files]
+    return mark_ready(render_images(names, workers))
@@ -0,0 +1,119 @@
+"""Лента подписок, собираемая при чтении (pull model).
+
+Для каждого автора в кэше лежит ограниченный список ключей
+(created, id) его последних постов. Страница ленты — k-way merge
+таймлайнов авторов, на которых подписан читатель, и один in_bulk
+запрос за самими постами. Глубина ленты ограничена FEED_TIMELINE_SIZE
+постами на автора. Недостающие в кэше таймлайны читаются одним
+запросом с ROW_NUMBER() на шард, сколько бы авторов ни выпало из кэша.
+Новый или удалённый пост сбрасывает таймлайн автора (drop_timeline).
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+
+from core.paginator import NEXT, CursorPaginator, decode_cursor
+from . import following, sharding
+from .models import Post
+
+TIMELINE_KEY = 'posts:timeline:{}'
+# Авторов в одном запросе: SQLite ограничивает число параметров
+AUTHORS_PER_QUERY = 500
+TIMELINES_SQL = """
+    SELECT id, author_id, created FROM (
+        SELECT id, author_id, created, ROW_NUMBER() OVER (
+            PARTITION BY author_id ORDER BY created DESC, id DESC
+        ) AS position
+        FROM {table}
+        WHERE author_id IN ({authors})
+    )
+    WHERE position <= %s
+    ORDER BY author_id, created DESC, id DESC
+"""
+
+
+def _key(author_id):
+    return TIMELINE_KEY.format(author_id)
+
+
+def get_timelines(author_ids):
+    """Таймлайны авторов: недостающие в кэше читаются из базы."""
+    keys = {_key(author_id): author_id for author_id in author_ids}
+    timelines = {
+        keys[key]: timeline
+        for key, timeline in cache.get_many(list(keys)).items()
+    }
+    read = read_timelines(set(author_ids) - set(timelines))
+    if read:
+        cache.set_many(
+            {_key(author_id): posts for author_id, posts in read.items()},
+            # Сборка, обогнавшая сброс, устареет не дольше чем на TTL
+            timeout=settings.LISTING_CACHE_TIMEOUT,
+        )
+        timelines.update(read)
+    return timelines
+
+
+def read_timelines(author_ids):
+    """Таймлайны авторов из базы: запрос на шард и AUTHORS_PER_QUERY."""
+    timelines = {author_id: [] for author_id in author_ids}
+    for posts in Post.objects.each_shard():
+        ids = [
+            author_id for author_id in timelines
+            if not sharding.enabled()
+            or sharding.shard_for_author(author_id) == posts.db
+        ]
+        for start in range(0, len(ids), AUTHORS_PER_QUERY):
+            chunk = ids[start:start + AUTHORS_PER_QUERY]
+            sql = TIMELINES_SQL.format(
+                table=Post._meta.db_table,
+                authors=', '.join(['%s'] * len(chunk)),
+            )
+            params = [*chunk, settings.FEED_TIMELINE_SIZE]
+            for post in posts.raw(sql, params):
+                timelines[post.author_id].append((post.created, post.pk))
+    return timelines
+
+
+def drop_timeline(author_id):
+    """Сбрасывает таймлайн автора: следующее чтение соберёт его из базы.
+
+    Новый пост не дописывается в кэшированный список: get и set двух
+    одновременных записей потеряли бы один из постов.
+    """
+    cache.delete(_key(author_id))
+
+
+def get_page(user, cursor, per_page):
+    """Страница ленты по курсору, тип совместим с Paginator.get_page."""
+    author_ids = list(following.get_following(user.pk))
+    merged = heapq.merge(
+        *get_timelines(author_ids).values(), reverse=True
+    )
+    position = decode_cursor(cursor) if cursor else None
+    if position is None:
+        keys = list(islice(merged, per_page + 1))
+        has_next, has_previous = len(keys) > per_page, False
+        keys = keys[:per_page]
+    else:
+        direction, created, pk = position
+        if direction == NEXT:
+            older = (key for key in merged if key < (created, pk))
+            keys = list(islice(older, per_page + 1))
+            has_next, has_previous = len(keys) > per_page, True
+            keys = keys[:per_page]
+        else:
+            newer = [key for key in merged if key > (created, pk)]
+            has_next = True
+            has_previous = len(newer) > per_page
+            keys = newer[-per_page:]
+    posts = Post.objects.everywhere().select_related('author', 'group')
+    found = posts.in_bulk([pk for _, pk in keys])
+    rows = [found[pk] for _, pk in keys if pk in found]
+    paginator = CursorPaginator([], per_page)
+    return paginator.set_cursors(
+        Page(rows, None, paginator), has_next, has_previous
+    )
@@ -1,68 +1,135 @@
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from django.urls import reverse
+from .models import Post, Group, User, Follow, Comment
 from django.contrib.auth.decorators import login_required
 from .forms import PostForm, CommentForm
+from . import feed
+from .counters import get_user_counters
+from . import following, generations, search as post_search
+from .sharding import save_serialized
+from .conditional import (
+    conditional, group_scopes, index_scopes, post_scopes, profile_scopes
+)
+from core.paginator import CursorPaginator, get_cursor_page
+from core.routers import replica_reads
+from core.writes import busy_as_503, serialized_write
 
 
+@replica_reads
+@conditional(index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.everywhere().select_related('author', 'group')
+    page_obj = get_cursor_page(
+        request, post_list, settings.POSTS_PER_PAGE
+    )
     context = {
         'page_obj': page_obj,
         'index': True,
+        'listing_key': generations.listing_key(
+            request, generations.index_scope()
+        ),
+        'listing_timeout': generations.listing_timeout(),
     }
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+@conditional(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.everywhere().filter(group=group).select_related(
+        'author', 'group'
+    )
+    page_obj = get_cursor_page(
+        request, post_list, settings.POSTS_PER_PAGE, group.posts_count
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        'listing_key': generations.listing_key(
+            request, generations.group_scope(group.pk)
+        ),
+        'listing_timeout': generations.listing_timeout(),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@replica_reads
+@conditional(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    all_user_posts = author.posts.all()
-    paginator = Paginator(all_user_posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    count = all_user_posts.count()
-    if request.user.is_authenticated and Follow.objects.filter(
-            user=request.user, author=author).exists():
-        following = True
-    else:
-        following = False
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    counters = get_user_counters(author)
+    all_user_posts = Post.objects.of_author(
+        author.pk, archived=True
+    ).select_related('group')
+    page_obj = get_cursor_page(
+        request, all_user_posts, settings.POSTS_PER_PAGE,
+        counters.posts_count
+    )
+    is_following = (
+        request.user.is_authenticated
+        and author.pk in following.get_following(request.user.pk)
+    )
     context = {
         'author': author,
         'page_obj': page_obj,
-        'count': count,
-        'following': following,
+        'count': counters.posts_count,
+        'counters': counters,
+        'listing_key': generations.listing_key(
+            request, generations.profile_scope(author.pk)
+        ),
+        'listing_timeout': generations.listing_timeout(),
+        'following': is_following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@replica_reads
+@conditional(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    try:
+        post = Post.objects.get_or_archived(
+            post_id, 'author__counters', 'group'
+        )
+    except Post.DoesNotExist:
+        raise Http404
     form = CommentForm()
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+    ).get_cursor_page()
     context = {
         'post': post,
+        'author_counters': get_user_counters(post.author),
         'form': form,
-        'comments': post.comments.all(),
+        'comments': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент для подгрузки."""
+    for archived in (False, True):
+        comments = get_cursor_page(
+            request,
+            Comment.objects.of_post(
+                post_id, archived=archived
+            ).select_related('author'),
+            settings.COMMENTS_PER_PAGE,
+        )
+        if comments.object_list:
+            break
+    context = {'comments': comments, 'post_id': post_id}
+    return render(request, 'includes/comment_list.html', context)
+
+
 @login_required
+@busy_as_503
 def post_create(request):
     form = PostForm()
     if request.method == 'POST':
@@ -70,16 +137,21 @@ def post_create(request):
         if form.is_valid():
             new = form.save(commit=False)
             new.author = request.user
-            new.save()
+            form.store_image()
+            save_serialized(new)
             return redirect('posts:profile', request.user.username)
         return render(request, 'posts/create_post.html', {'form': form})
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@busy_as_503
 def post_edit(request, post_id):
     is_edit = True
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.shard_of(post_id).select_related('author'),
+        pk=post_id
+    )
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
@@ -90,63 +162,107 @@ def post_edit(request, post_id):
     if form.is_valid():
         post.text = form.cleaned_data['text']
         post.group = form.cleaned_data['group']
-        post.save()
+        fields = ['text', 'group', 'updated']
+        if 'image' in form.changed_data:
+            # Новая картинка или снятая галочка «очистить»
+            form.store_image()
+            fields.append('image')
+        save_serialized(post, update_fields=fields)
         return redirect('posts:post_detail', post_id)
     context = {'form': form, 'is_edit': is_edit}
     return render(request, 'posts/create_post.html', context)
 
 
 @login_required
+@busy_as_503
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.shard_of(post_id), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        save_serialized(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@replica_reads
 def follow_index(request):
-    user = request.user
-    post = Post.objects.filter(
-        author__id__in=user.follower.values('author_id')
-    )
-    paginator = Paginator(post, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj, 'follow': True, }
+    page_obj = feed.get_feed_page(request)
+    context = {
+        'page_obj': page_obj,
+        'follow': True,
+        'listing_timeout': settings.LISTING_CACHE_TIMEOUT,
+    }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@serialized_write(methods=('GET', 'POST'))
 def profile_follow(request, username):
     user_to_follow = get_object_or_404(User, username=username)
-    if Follow.objects.filter(
-            user=request.user,
-            author=user_to_follow).exists():
-        return redirect('posts:follow_index')
     if user_to_follow == request.user:
         return redirect('posts:follow_index')
-    Follow.objects.create(
-        user=request.user,
-        author=user_to_follow)
+    # Решает база, а не кэш: копия кэша в другом процессе могла отстать
+    try:
+        with transaction.atomic():
+            Follow.objects.create(
+                user=request.user,
+                author=user_to_follow)
+    except IntegrityError:
+        # Подписка уже есть
+        following.add(request.user.pk, user_to_follow.pk)
     return redirect('posts:follow_index')
 
 
 @login_required
+@serialized_write(methods=('GET', 'POST'))
 def profile_unfollow(request, username):
     user_to_unfollow = get_object_or_404(User, username=username)
     if user_to_unfollow == request.user:
         return redirect('posts:follow_index')
-    if not Follow.objects.filter(
-            user=request.user,
-            author=user_to_unfollow).exists():
-        return redirect('posts:follow_index')
-    Follow.objects.get(
+    deleted, _ = Follow.objects.filter(
         user=request.user,
         author=user_to_unfollow
     ).delete()
+    if not deleted:
+        # Подписки уже нет
+        following.discard(request.user.pk, user_to_unfollow.pk)
     return redirect('posts:follow_index')
+
+
+def search(request):
+    query = request.GET.get('q', '')
+    page_obj = post_search.search(
+        query, request.GET.get('cursor'), settings.POSTS_PER_PAGE
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def search_api(request):
+    page_obj = post_search.search(
+        request.GET.get('q', ''),
+        request.GET.get('cursor'),
+        settings.POSTS_PER_PAGE,
+    )
+    results = [
+        {
+            'id': post.pk,
+            'author': post.author.username,
+            'group': post.group.slug if post.group else None,
+            'created': post.created,
+            'rank': post.rank,
+            'snippet': post.snippet,
+            'url': reverse('posts:post_detail', args=[post.pk]),
+        }
+        for post in page_obj
+    ]
+    return JsonResponse({
+        'results': results,
+        'next_cursor': page_obj.next_cursor,
+    })
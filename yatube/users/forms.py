@@ -1,12 +1,24 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth import forms
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 
+from core.writes import run_serialized
+
 User = get_user_model()
 
 
-class CreationForm(UserCreationForm):
-    class Meta(UserCreationForm.Meta):
+class SerializedSaveMixin:
+    """Пароль хешируется до блокировки записи, под ней — только save()."""
+
+    def save(self, commit=True):
+        user = super().save(commit=False)
+        if commit:
+            run_serialized(user.save)
+        return user
+
+
+class CreationForm(SerializedSaveMixin, forms.UserCreationForm):
+    class Meta(forms.UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
 
@@ -18,3 +30,11 @@ class CreationForm(UserCreationForm):
             raise ValidationError("Не забудьте ввести Имя")
         if last_name is None or last_name == '':
             raise ValidationError("Не забудьте ввести Фамилию")
+
+
+class PasswordChangeForm(SerializedSaveMixin, forms.PasswordChangeForm):
+    pass
+
+
+class SetPasswordForm(SerializedSaveMixin, forms.SetPasswordForm):
+    pass
@@ -2,17 +2,23 @@ from django.contrib.auth import views as v
 from . import views
 from django.urls import path
 
+from core.writes import busy_as_503
+from .forms import PasswordChangeForm, SetPasswordForm
+
 app_name = 'users'
 
 urlpatterns = [
     path(
         'logout/',
-        v.LogoutView.as_view(template_name='users/logged_out.html'),
+        # Выход — одно удаление сессии, ему хватает busy_timeout
+        busy_as_503(
+            v.LogoutView.as_view(template_name='users/logged_out.html')
+        ),
         name='logout'
     ),
     path(
         'login/',
-        v.LoginView.as_view(template_name='users/login.html'),
+        views.LoginView.as_view(template_name='users/login.html'),
         name='login'
     ),
     path(
@@ -22,9 +28,10 @@ urlpatterns = [
     ),
     path(
         'pass_change/',
-        v.PasswordChangeView.as_view(
-            template_name='users/password_change_form.html'
-        ),
+        busy_as_503(v.PasswordChangeView.as_view(
+            template_name='users/password_change_form.html',
+            form_class=PasswordChangeForm,
+        )),
         name='pass_change'
     ),
     path('password_change/done/',
@@ -43,9 +50,10 @@ urlpatterns = [
          ),
          name='password_reset_done'),
     path('reset/<uidb64>/<token>/',
-         v.PasswordResetConfirmView.as_view(
-             template_name='users/password_reset_confirm.html'
-         ),
+         busy_as_503(v.PasswordResetConfirmView.as_view(
+             template_name='users/password_reset_confirm.html',
+             form_class=SetPasswordForm,
+         )),
          name='password_reset_confirm'),
     path('reset/done/',
          v.PasswordResetCompleteView.as_view(
@@ -1,12 +1,23 @@
+from django.contrib.auth import views as auth_views
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView
 
 from django.urls import reverse_lazy
 
+from core.writes import busy_as_503, run_serialized
 from .forms import CreationForm
 
 
+@method_decorator(busy_as_503, name='post')
 class SignUp(CreateView):
     form_class = CreationForm
     # После успешной регистрации перенаправляем пользователя на главную.
     success_url = reverse_lazy('posts:main_page')
     template_name = 'users/signup.html'
+
+
+@method_decorator(busy_as_503, name='post')
+class LoginView(auth_views.LoginView):
+    def form_valid(self, form):
+        # Пароль уже проверен формой: под блокировкой только вход
+        return run_serialized(super().form_valid, form)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -52,6 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.routers.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,13 +90,88 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Профили SQLite: PRAGMAS выполняются на каждом новом подключении
+# (core.db). 'production' — WAL, ожидание блокировки вместо ошибки
+# "database is locked" и постоянные соединения; 'default' — настройки
+# SQLite как есть, для сравнения в benchmarks/sqlite.py
+SQLITE_PROFILES = {
+    'default': {
+        'CONN_MAX_AGE': 0,
+        'PRAGMAS': {},
+    },
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'PRAGMAS': {
+            # Первой: переключение в WAL само может ждать блокировку
+            'busy_timeout': 5000,
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -64000,
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+DATABASE_PROFILE = os.environ.get('YATUBE_DATABASE_PROFILE', 'production')
+# Запись (core.writes): повторы транзакции при "database is locked" и
+# пауза перед повтором, секунды — растёт вдвое до WRITE_BACKOFF_MAX
+WRITE_RETRIES = 3
+WRITE_BACKOFF = 0.05
+WRITE_BACKOFF_MAX = 1.0
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        **SQLITE_PROFILES[DATABASE_PROFILE],
     }
 }
 
+# Реплика для чтения лент (core.routers): копия базы, которую держит в
+# актуальном состоянии внешний инструмент (litestream, .backup по
+# расписанию). Путь к файлу — в YATUBE_REPLICA_PATH; без него всё
+# читается из основной базы
+REPLICA_PATH = os.environ.get('YATUBE_REPLICA_PATH')
+if REPLICA_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_PATH,
+        **SQLITE_PROFILES[DATABASE_PROFILE],
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASE = 'replica' if REPLICA_PATH else None
+# Модели каких приложений читаются с реплики
+REPLICA_APPS = ['posts']
+# Сколько секунд писавший читает основную базу, и сколько живут
+# фрагменты кэша, собранные по реплике (не меньше её отставания)
+REPLICA_STICKY_SECONDS = 10
+REPLICA_CACHE_TIMEOUT = 10
+
+# Шарды постов и комментариев (posts.sharding): файлы SQLite через
+# запятую в YATUBE_SHARD_PATHS. Пост живёт в шарде автора, комментарии —
+# рядом с постом. Пользователи и группы остаются в основной базе, поэтому
+# внешние ключи в шардах не проверяются. Без переменной всё хранится в
+# основной базе
+SHARD_PATHS = [
+    path for path in os.environ.get('YATUBE_SHARD_PATHS', '').split(',')
+    if path
+]
+for number, path in enumerate(SHARD_PATHS):
+    DATABASES[f'shard{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        **SQLITE_PROFILES[DATABASE_PROFILE],
+        'PRAGMAS': {
+            **SQLITE_PROFILES[DATABASE_PROFILE]['PRAGMAS'],
+            'foreign_keys': 'OFF',
+        },
+    }
+POST_SHARDS = [f'shard{number}' for number in range(len(SHARD_PATHS))]
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'core.routers.ReplicaRouter',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -149,8 +228,77 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш общий для всех процессов: поколения списков (posts.generations)
+# увеличивают и другие воркеры, и команды (render_thumbnails,
+# archive_content, import_content, seed_data). LocMemCache у каждого
+# процесса свой, и сброс из соседнего процесса до него не дошёл бы.
+# Каталог — YATUBE_CACHE_DIR, один на все процессы сайта и команд
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'yatube-cache'),
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
     }
 }
+
+POSTS_PER_PAGE = 10
+# Комментарии на post_detail, остальные подгружаются по курсору
+COMMENTS_PER_PAGE = 20
+
+# Движок ленты подписок: 'query', 'fanout' или 'merge' (см. posts.feed).
+# Таблица 'fanout' ссылается на посты, а с шардами они в других базах
+FOLLOW_FEED_ENGINE = 'query' if POST_SHARDS else 'fanout'
+FEED_TIMELINE_SIZE = 200
+# Посты старше стольких дней без свежих комментариев переносит в архив
+# команда archive_content (posts.archive)
+ARCHIVE_AFTER_DAYS = 365
+
+# Максимум SQL-запросов на запрос к URL (с учётом сессии и пользователя
+# и всех баз). Чтения thumbnail_kvstore не считаются (core.middleware).
+# QUERY_BUDGET_ACTION: 'log', 'raise' или None
+QUERY_BUDGET_ACTION = 'log'
+QUERY_BUDGETS = {
+    'posts:main_page': 3,
+    'posts:group_page': 5,
+    # Профиль читает и архив; пост из архива ищется после горячей таблицы
+    'posts:profile': 7,
+    'posts:post_detail': 7,
+    'posts:post_comments': 3,
+    # Пишущие страницы: ещё один запрос — BEGIN IMMEDIATE (core.writes).
+    # Группа в форме — выбор и проверка ключа, плюс счётчик группы;
+    # новая картинка на правке — сброс thumbnails_ready
+    'posts:post_create': 9,
+    'posts:post_edit': 9,
+    'posts:add_comment': 6,
+    # Холодные ленты авторов (merge) читаются одним запросом на шард
+    'posts:follow_index': 5,
+    'posts:profile_follow': 11,
+    'posts:profile_unfollow': 10,
+    'posts:search': 4,
+    'posts:search_api': 4,
+    'api:post_list': 3,
+    'api:group_posts': 4,
+    'api:profile_posts': 4,
+    'api:post_detail': 5,
+    'api:post_comments': 3,
+    'api:follow_posts': 3,
+}
+
+# Фрагменты списков постов сбрасываются сменой поколения (posts.generations)
+LISTING_CACHE_TIMEOUT = 60 * 60
+# Множество авторов, на которых подписан пользователь (posts.following)
+FOLLOWING_CACHE_TIMEOUT = 5 * 60
+
+# Размеры миниатюр, которые готовит команда render_thumbnails
+THUMBNAIL_PRESETS = {
+    '500x339': {'crop': 'center', 'upscale': True},
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+
+# Заголовок Server-Timing (SQL, шаблоны, кэш); SERVER_TIMING_LOG — ещё и
+# JSON-строка в логгер core.timing
+SERVER_TIMING = False
+SERVER_TIMING_LOG = False